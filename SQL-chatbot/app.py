@@ -1,9 +1,15 @@
 import streamlit as st
+import uuid
 import pandas as pd
 from datetime import datetime
 from db.initialize_db import init_db
-from utils.sql_generator import SQLGenerator
-from utils.db_utils import execute_query
+from utils.sql_generator import SQLGenerator, strip_code_fences
+from utils.sql_cache import get_sql_cache
+from utils.result_renderer import render_cached
+from utils import query_guard
+from utils.conversation_store import ConversationStore
+from utils.fast_path import get_fast_path
+from utils.db_utils import execute_paged, explain_query, fetch_page, get_pool, get_result_cache, PAGE_SIZE
 
 # Initialize DB at startup
 try:
@@ -349,6 +355,12 @@ if 'conversation_count' not in st.session_state:
     st.session_state.conversation_count = 0
 if 'query_count' not in st.session_state:
     st.session_state.query_count = 0
+if 'rendered_results' not in st.session_state:
+    # message id -> rendered result text, so old turns are never re-formatted
+    st.session_state.rendered_results = {}
+if 'result_store' not in st.session_state:
+    # Full result frames live here; messages keep a preview plus a handle
+    st.session_state.result_store = ConversationStore()
 
 # Enhanced Sidebar
 with st.sidebar:
@@ -374,6 +386,49 @@ with st.sidebar:
     
     st.markdown("<br>", unsafe_allow_html=True)
     
+    # Database performance counters
+    with st.expander("⚙️ Performance"):
+        pool_stats = get_pool().stats()
+        st.caption(
+            f"Connection pool: {pool_stats['size']} open, {pool_stats['idle']} idle · "
+            f"hit rate {pool_stats['hit_rate']:.0%} ({pool_stats['hits']} hits / {pool_stats['misses']} misses) · "
+            f"{pool_stats['waits']} waits, avg {pool_stats['avg_wait_ms']:.1f} ms"
+        )
+        cache_stats = get_sql_cache().stats()
+        st.caption(
+            f"SQL cache: {cache_stats['entries']} entries · hit rate {cache_stats['hit_rate']:.0%} "
+            f"({cache_stats['hits']} exact / {cache_stats['near_hits']} near / {cache_stats['misses']} misses) · "
+            f"{cache_stats['evictions']} evictions · saved {cache_stats['saved_latency_s']:.1f} s"
+        )
+        result_stats = get_result_cache().stats()
+        st.caption(
+            f"Result cache: {result_stats['entries']} entries, "
+            f"{result_stats['bytes'] / 1024:.0f} / {result_stats['max_bytes'] / 1024:.0f} KB · "
+            f"hit rate {result_stats['hit_rate']:.0%} · {result_stats['evictions']} evictions · "
+            f"{result_stats['invalidations']} invalidations"
+        )
+        store_stats = st.session_state.result_store.stats()
+        st.caption(
+            f"Session results: {store_stats['stored']} stored ({store_stats['disk_bytes'] / 1024:.0f} KB on disk) · "
+            f"{store_stats['in_memory']} in memory ({store_stats['memory_bytes'] / 1024:.0f} / "
+            f"{store_stats['memory_cap'] / 1024:.0f} KB) · {store_stats['evictions']} evictions"
+        )
+        fast_stats = get_fast_path().stats()
+        st.caption(
+            f"Fast path: {fast_stats['matches']} / {fast_stats['lookups']} questions answered without Gemini "
+            f"({fast_stats['match_rate']:.0%}) · saved ~{fast_stats['saved_latency_s']:.1f} s"
+        )
+        guard_stats = query_guard.stats()
+        st.caption(
+            f"Query guard: {guard_stats['checked']} checked · {guard_stats['limited']} auto-limited · "
+            f"{guard_stats['aborted']} aborted"
+        )
+        for abort in guard_stats['recent_aborts'][-3:]:
+            plan = '\n'.join(row[-1] for row in abort['plan'])
+            st.code(f"-- {abort['reason']}\n{abort['query']}\n-- plan:\n{plan}", language='sql')
+    
+    stream_mode = st.toggle("⚡ Stream SQL generation", value=True)
+    
     # New conversation button
     if st.button("✨ New Conversation", use_container_width=True):
         if st.session_state.current_conversation:
@@ -406,6 +461,8 @@ with st.sidebar:
             st.session_state.conversations = []
             st.session_state.current_conversation = []
             st.session_state.query_count = 0
+            st.session_state.rendered_results = {}
+            st.session_state.result_store.clear()
             st.rerun()
 
 # Enhanced Main content
@@ -416,40 +473,26 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-def format_data_naturally(df):
-    """Enhanced data formatting with better structure"""
-    if df.empty:
-        return "🔍 No data found for your query."
-    
-    rows = len(df)
-    cols = list(df.columns)
-    
-    # Enhanced summary with emojis
-    if rows == 1:
-        summary = f"📊 Found **1 record**:\n\n"
-    else:
-        summary = f"📊 Found **{rows} records**:\n\n"
-    
-    if rows <= 8:
-        result_text = summary
-        for i, row in df.iterrows():
-            result_text += f"**Record {i+1}:**\n"
-            for col in cols:
-                value = row[col] if not pd.isna(row[col]) else "*Not specified*"
-                result_text += f"   • **{col}:** {value}\n"
-            result_text += "\n"
+def render_page_browser(idx, msg):
+    """Page through a large result, loading each page on demand."""
+    page = msg.get('page', 0)
+    page_count = -(-msg['total'] // PAGE_SIZE)
+    prev_col, info_col, next_col = st.columns([1, 4, 1])
+    with prev_col:
+        if st.button("◀", key=f"prev_page_{idx}", disabled=page == 0):
+            msg['page'] = page - 1
+            st.rerun()
+    with info_col:
+        st.caption(f"Page {page + 1} of {page_count} · {msg['total']} records")
+    with next_col:
+        if st.button("▶", key=f"next_page_{idx}", disabled=page >= page_count - 1):
+            msg['page'] = page + 1
+            st.rerun()
+    if page == 0:
+        st.dataframe(st.session_state.result_store.get(msg['handle']), use_container_width=True)
     else:
-        result_text = summary
-        for i, row in df.head(5).iterrows():
-            result_text += f"**Record {i+1}:**\n"
-            for col in cols[:5]:  # Show max 5 columns
-                value = row[col] if not pd.isna(row[col]) else "*Not specified*"
-                result_text += f"   • **{col}:** {value}\n"
-            result_text += "\n"
-        if rows > 5:
-            result_text += f"*... and **{rows - 5}** more records*\n"
-    
-    return result_text
+        cols, rows = fetch_page(msg['query'], page, PAGE_SIZE, msg.get('params', ()))
+        st.dataframe(pd.DataFrame(rows, columns=cols), use_container_width=True)
 
 # Instantiate SQL generator
 sql_gen = SQLGenerator()
@@ -477,7 +520,7 @@ with chat_container:
         </div>
         """, unsafe_allow_html=True)
     else:
-        for msg in st.session_state.current_conversation:
+        for idx, msg in enumerate(st.session_state.current_conversation):
             if msg['role'] == 'user':
                 st.markdown(f'<div class="user-message">💬 **You:** {msg["content"]}</div>', unsafe_allow_html=True)
             elif msg['role'] == 'assistant':
@@ -489,7 +532,7 @@ with chat_container:
                 """, unsafe_allow_html=True)
             elif msg['role'] == 'result':
                 if isinstance(msg['content'], pd.DataFrame):
-                    content = format_data_naturally(msg['content'])
+                    content = render_cached(st.session_state.rendered_results, msg)
                 else:
                     content = msg['content']
                 st.markdown(f"""
@@ -497,6 +540,8 @@ with chat_container:
                     <strong>📋 Results:</strong><br><br>{content.replace(chr(10), '<br>')}
                 </div>
                 """, unsafe_allow_html=True)
+                if msg.get('query') and msg.get('total', 0) > PAGE_SIZE:
+                    render_page_browser(idx, msg)
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -523,29 +568,60 @@ if submit and user_input:
     })
     
     with st.spinner('🔮 Generating SQL query...'):
+        # Set once Gemini's SQL has compiled and run, so failures can evict it from the cache
+        generated_sql, sql_ok = None, False
         try:
-            raw_sql = sql_gen.nl_to_sql(user_input)
-            lines = raw_sql.splitlines()
-            clean_lines = [line for line in lines if not line.strip().startswith('```')]
-            sql_query = '\n'.join(clean_lines).strip()
+            # Formulaic questions compile locally to parameterized SQL; the name
+            # check reads the same cached first page the query execution uses below
+            fast_match = get_fast_path().match(
+                user_input, has_rows=lambda sql, params: bool(execute_paged(sql, PAGE_SIZE, params).rows))
+            params = ()
+            if fast_match:
+                raw_sql, params = fast_match
+            elif stream_mode:
+                # Show the SQL as it is generated
+                preview = st.empty()
+                raw_sql = ''
+                for chunk in sql_gen.stream_sql(user_input):
+                    raw_sql += chunk
+                    preview.code(raw_sql, language='sql')
+                preview.empty()
+            else:
+                raw_sql = sql_gen.nl_to_sql(user_input)
+            if not fast_match:
+                generated_sql = raw_sql
+            sql_query = strip_code_fences(raw_sql)
+
+            # Compile the statement right away so invalid SQL fails before execution
+            explain_query(sql_query, params)
 
             st.session_state.current_conversation.append({
                 'role': 'assistant',
-                'content': sql_query,
+                'content': sql_query + (f"\n-- params: {list(params)}" if params else ''),
                 'timestamp': datetime.now().isoformat()
             })
             
             with st.spinner('⚡ Executing query...'):
-                cols, rows = execute_query(sql_query)
-                if cols and rows:
-                    df = pd.DataFrame(rows, columns=cols)
+                result = execute_paged(sql_query, PAGE_SIZE, params)
+                sql_ok = True
+                if result.columns and result.rows:
+                    # Only the first page is kept; later pages load on demand
+                    df = pd.DataFrame(result.rows, columns=result.columns)
                     st.session_state.current_conversation.append({
                         'role': 'result',
-                        'content': df,
+                        'id': uuid.uuid4().hex,
+                        'content': ConversationStore.preview(df),
+                        'handle': st.session_state.result_store.put(df),
+                        'total': result.total,
+                        'query': result.query,
+                        'params': result.params,
+                        'page': 0,
                         'timestamp': datetime.now().isoformat()
                     })
                     st.session_state.query_count += 1
-                    st.success(f"✅ Query executed successfully! Found {len(rows)} records.")
+                    st.success(f"✅ Query executed successfully! Found {result.total} records.")
+                    if result.guard.get('limit_added'):
+                        st.info(f"ℹ️ The query plan showed a full scan or cross join, so results were capped at {result.guard['limit_added']} rows.")
                 else:
                     st.warning("⚠️ Query executed but returned no results.")
                     st.session_state.current_conversation.append({
@@ -555,6 +631,8 @@ if submit and user_input:
                     })
                     
         except Exception as e:
+            if generated_sql is not None and not sql_ok:
+                sql_gen.invalidate(user_input, generated_sql)
             st.error(f"❌ Error: {e}")
             st.session_state.current_conversation.append({
                 'role': 'result',
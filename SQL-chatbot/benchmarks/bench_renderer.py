@@ -0,0 +1,94 @@
+"""
+Micro-benchmark: legacy iterrows() renderer vs the vectorized renderer.
+
+Run from the SQL-chatbot directory:
+    python -m benchmarks.bench_renderer
+"""
+import timeit
+import numpy as np
+import pandas as pd
+
+from utils.result_renderer import format_data_naturally, render_cached
+
+
+def legacy_format_data_naturally(df):
+    """The original app.py implementation, kept as the baseline."""
+    if df.empty:
+        return "🔍 No data found for your query."
+
+    rows = len(df)
+    cols = list(df.columns)
+
+    if rows == 1:
+        summary = f"📊 Found **1 record**:\n\n"
+    else:
+        summary = f"📊 Found **{rows} records**:\n\n"
+
+    if rows <= 8:
+        result_text = summary
+        for i, row in df.iterrows():
+            result_text += f"**Record {i+1}:**\n"
+            for col in cols:
+                value = row[col] if not pd.isna(row[col]) else "*Not specified*"
+                result_text += f"   • **{col}:** {value}\n"
+            result_text += "\n"
+    else:
+        result_text = summary
+        for i, row in df.head(5).iterrows():
+            result_text += f"**Record {i+1}:**\n"
+            for col in cols[:5]:
+                value = row[col] if not pd.isna(row[col]) else "*Not specified*"
+                result_text += f"   • **{col}:** {value}\n"
+            result_text += "\n"
+        if rows > 5:
+            result_text += f"*... and **{rows - 5}** more records*\n"
+
+    return result_text
+
+
+def make_frame(rows, cols, null_fraction=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for c in range(cols):
+        if c % 3 == 0:
+            values = rng.integers(0, 1_000_000, rows).astype(float)
+        elif c % 3 == 1:
+            values = rng.random(rows)
+        else:
+            values = np.array([f"text_{v}" for v in rng.integers(0, 1000, rows)], dtype=object)
+        mask = rng.random(rows) < null_fraction
+        values = pd.Series(values)
+        values[mask] = None
+        data[f"col_{c}"] = values
+    return pd.DataFrame(data)
+
+
+def bench(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    print(f"  {label:<12} {seconds * 1000:10.3f} ms/call")
+    return seconds
+
+
+def main():
+    cases = {
+        'wide 8x500': make_frame(8, 500),
+        'wide 8x2000': make_frame(8, 2000),
+        'long 1Mx9': make_frame(1_000_000, 9),
+    }
+    for name, df in cases.items():
+        print(name)
+        old = bench('legacy', lambda: legacy_format_data_naturally(df), 5)
+        new = bench('vectorized', lambda: format_data_naturally(df), 5)
+        print(f"  speedup      {old / new:10.1f}x")
+
+    # Reruns re-render every past turn; memoization makes that a dict lookup
+    history = [{'id': str(i), 'content': make_frame(8, 50, seed=i)} for i in range(50)]
+    cache = {}
+    print('rerun with 50 past results')
+    old = bench('legacy', lambda: [legacy_format_data_naturally(m['content']) for m in history], 3)
+    new = bench('memoized', lambda: [render_cached(cache, m) for m in history], 3)
+    print(f"  speedup      {old / new:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
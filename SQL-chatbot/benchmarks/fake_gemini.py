@@ -0,0 +1,63 @@
+"""
+Offline stand-in for GeminiClient with configurable latency.
+"""
+import asyncio
+import random
+import time
+
+# Keyword -> canned SQL, checked in order against the request text
+CANNED_SQL = (
+    ('how many', "SELECT COUNT(*) AS connection_count FROM connections"),
+    ('compan', "SELECT Company, COUNT(*) AS connection_count FROM connections GROUP BY Company ORDER BY connection_count DESC"),
+    ('engineer', "SELECT first_name, last_name, Company, Position FROM connections WHERE Position LIKE 'Software%' ORDER BY last_name"),
+    ('mentor', "SELECT * FROM connections WHERE rowid IN (SELECT rowid FROM connections_fts WHERE connections_fts MATCH 'goals:mentorship')"),
+)
+DEFAULT_SQL = "SELECT * FROM connections ORDER BY user_id DESC"
+
+
+class FakeGeminiClient:
+    """Mimics GeminiClient's interface, sleeping `latency` ± `jitter` seconds per call."""
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, seed: int = 0, chunk_size: int = 16):
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def _delay(self) -> float:
+        return max(self.latency + self._rng.uniform(-self.jitter, self.jitter), 0.0)
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        request = prompt.split('Request:', 1)[-1].split('\n', 1)[0].lower()
+        for keyword, sql in CANNED_SQL:
+            if keyword in request:
+                return sql
+        return DEFAULT_SQL
+
+    def generate_sql(self, prompt: str, model: str = None, timeout: float = None) -> str:
+        self.calls += 1
+        time.sleep(self._delay())
+        return self._answer(prompt)
+
+    def stream_sql(self, prompt: str, model: str = None, timeout: float = None):
+        self.calls += 1
+        sql = self._answer(prompt)
+        chunks = [sql[i:i + self.chunk_size] for i in range(0, len(sql), self.chunk_size)]
+        for chunk in chunks:
+            time.sleep(self._delay() / len(chunks))
+            yield chunk
+
+    async def agenerate_sql(self, prompt: str, model: str = None, timeout: float = None) -> str:
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        return self._answer(prompt)
+
+    async def astream_sql(self, prompt: str, model: str = None, timeout: float = None):
+        self.calls += 1
+        sql = self._answer(prompt)
+        chunks = [sql[i:i + self.chunk_size] for i in range(0, len(sql), self.chunk_size)]
+        for chunk in chunks:
+            await asyncio.sleep(self._delay() / len(chunks))
+            yield chunk
@@ -0,0 +1,227 @@
+"""
+Offline benchmark of the SQL-chatbot pipeline.
+
+Generates synthetic Connections.csv files, then times each stage (ingestion,
+query execution, rendering and the full chat loop against a fake Gemini
+client) and records peak Python memory. Results are written as JSON and
+checked against thresholds.json and, optionally, a previous run.
+
+Run from the SQL-chatbot directory:
+    python -m benchmarks.run_pipeline --rows 10000 100000
+    python -m benchmarks.run_pipeline --rows 1000000 --baseline benchmarks/results/last.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from db import initialize_db
+from utils import db_utils
+from utils.fast_path import get_fast_path
+from utils.result_renderer import format_data_naturally
+from utils.sql_cache import SQLCache
+from utils.sql_generator import SQLGenerator
+from benchmarks.fake_gemini import FakeGeminiClient
+from benchmarks.synth_data import generate_connections_csv
+
+BENCH_DIR = os.path.dirname(__file__)
+THRESHOLDS_PATH = os.path.join(BENCH_DIR, 'thresholds.json')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+QUERIES = {
+    'name_lookup': "SELECT * FROM connections WHERE first_name = 'Jane' AND last_name = 'Doe'",
+    'company_prefix': "SELECT * FROM connections WHERE Company LIKE 'Acme%'",
+    'fts_goals': "SELECT * FROM connections WHERE rowid IN "
+                 "(SELECT rowid FROM connections_fts WHERE connections_fts MATCH 'goals:mentorship')",
+    'group_by': "SELECT Company, COUNT(*) AS n FROM connections GROUP BY Company ORDER BY n DESC",
+    'select_all': "SELECT * FROM connections",
+}
+
+CHAT_QUESTIONS = [
+    "who works at Acme",
+    "how many connections do I have",
+    "show Jane Doe",
+    "list software engineers",
+    "which companies have the most connections",
+    "who is looking for a mentor",
+    "list software engineers",
+    "which companies have the most connections",
+]
+
+
+def measure(fn, setup=None, repeat=3, trace_memory=True):
+    """
+    Time fn over `repeat` runs (best and mean, in ms), then run it once more
+    under tracemalloc for peak Python memory, so tracing never skews timings.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    result = {'best_ms': min(timings), 'mean_ms': statistics.mean(timings)}
+    if trace_memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        fn()
+        result['peak_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return result
+
+
+def reset_db_state():
+    """Drop pooled connections and cached results so a stage starts cold."""
+    if db_utils._pool is not None:
+        db_utils._pool.close_all()
+    db_utils._pool = None
+    db_utils._result_cache = None
+
+
+def point_at(workdir: str):
+    initialize_db.DB_PATH = os.path.join(workdir, 'data.db')
+    initialize_db.CSV_PATH = os.path.join(workdir, 'Connections.csv')
+    db_utils.DB_PATH = initialize_db.DB_PATH
+    reset_db_state()
+
+
+def bench_size(rows: int, workdir: str, llm_latency: float, trace_memory: bool):
+    point_at(workdir)
+    start = time.perf_counter()
+    generate_connections_csv(initialize_db.CSV_PATH, rows)
+    print(f"  generated {rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+    stages = {}
+    stages['init_db_cold'] = measure(
+        lambda: initialize_db.init_db(force=True), setup=reset_db_state, repeat=1, trace_memory=trace_memory)
+    stages['init_db_unchanged'] = measure(initialize_db.init_db, trace_memory=trace_memory)
+
+    def clear_results():
+        db_utils.get_result_cache().clear()
+
+    for name, query in QUERIES.items():
+        def first_page(q=query):
+            result = db_utils.execute_paged(q)
+            return result.total
+        stages[f'query_{name}'] = measure(first_page, setup=clear_results, trace_memory=trace_memory)
+        stages[f'query_{name}_cached'] = measure(first_page, trace_memory=trace_memory)
+
+    result = db_utils.execute_paged(QUERIES['select_all'])
+    frame = pd.DataFrame(result.rows, columns=result.columns)
+    stages['render_page'] = measure(lambda: format_data_naturally(frame, result.total), trace_memory=trace_memory)
+
+    # Full chat loop: fast path or (fake) Gemini, validation, execution, rendering
+    cache = SQLCache(path=os.path.join(workdir, 'nl_cache.db'))
+    client = FakeGeminiClient(latency=llm_latency)
+    generator = SQLGenerator(cache=cache, client=client)
+    turn_ms = []
+
+    def chat_loop():
+        cache.clear()
+        clear_results()
+        turn_ms.clear()
+        for question in CHAT_QUESTIONS:
+            start = time.perf_counter()
+            params = ()
+            fast_match = get_fast_path().match(
+                question, has_rows=lambda sql, params: bool(db_utils.execute_paged(sql, params=params).rows))
+            if fast_match:
+                sql, params = fast_match
+            else:
+                sql = generator.nl_to_sql(question)
+            db_utils.explain_query(sql, params)
+            paged = db_utils.execute_paged(sql, params=params)
+            frame = pd.DataFrame(paged.rows, columns=paged.columns)
+            format_data_naturally(frame, paged.total)
+            turn_ms.append((time.perf_counter() - start) * 1000)
+
+    stages['chat_loop'] = measure(chat_loop, repeat=1, trace_memory=trace_memory)
+    stages['chat_loop'].update({
+        'turns': len(CHAT_QUESTIONS),
+        'turn_mean_ms': statistics.mean(turn_ms),
+        'turn_p95_ms': sorted(turn_ms)[int(0.95 * (len(turn_ms) - 1))],
+        'llm_calls': client.calls,
+    })
+    return stages
+
+
+def check(results: dict, thresholds: dict, baseline: dict = None) -> list:
+    """
+    Compare a run against absolute thresholds (max_ms, optionally scaled per
+    million rows) and, if given, a baseline run with a relative tolerance.
+    """
+    failures = []
+    tolerance = thresholds.get('regression_tolerance', 0.25)
+    for size, stages in results['sizes'].items():
+        rows = int(size)
+        for stage, numbers in stages.items():
+            limit = thresholds.get('stages', {}).get(stage)
+            if limit:
+                max_ms = limit.get('max_ms', float('inf')) + limit.get('max_ms_per_million_rows', 0) * rows / 1e6
+                if numbers['best_ms'] > max_ms:
+                    failures.append(f"{stage} @ {rows:,} rows: {numbers['best_ms']:.1f} ms > threshold {max_ms:.1f} ms")
+            previous = (baseline or {}).get('sizes', {}).get(size, {}).get(stage)
+            if previous and numbers['best_ms'] > previous['best_ms'] * (1 + tolerance) + 1.0:
+                failures.append(f"{stage} @ {rows:,} rows: {numbers['best_ms']:.1f} ms regressed from "
+                                f"{previous['best_ms']:.1f} ms (> {tolerance:.0%})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000],
+                        help='dataset sizes to benchmark (10k to 10M)')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='fake Gemini latency in seconds')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc peak-memory passes')
+    parser.add_argument('--baseline', help='previous results JSON to check for regressions')
+    parser.add_argument('--out', help='where to write results JSON (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'sqlite': db_utils.sqlite3.sqlite_version,
+        'llm_latency_s': args.llm_latency,
+        'sizes': {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            print(f"Benchmarking {rows:,} rows")
+            results['sizes'][str(rows)] = bench_size(rows, workdir, args.llm_latency, not args.no_memory)
+            for stage, numbers in results['sizes'][str(rows)].items():
+                peak = f"{numbers['peak_kb']:>10.0f} KB" if 'peak_kb' in numbers else ''
+                print(f"  {stage:<28} {numbers['best_ms']:>10.2f} ms {peak}")
+        reset_db_state()
+    results['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    out = args.out or os.path.join(RESULTS_DIR, f"pipeline-{results['timestamp'].replace(':', '')}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out}")
+
+    with open(THRESHOLDS_PATH) as f:
+        thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check(results, thresholds, baseline)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
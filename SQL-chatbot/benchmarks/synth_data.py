@@ -0,0 +1,57 @@
+"""
+Synthetic Connections.csv generator for benchmarks.
+
+    python -m benchmarks.synth_data --rows 1000000 --out /tmp/Connections.csv
+"""
+import argparse
+import csv
+import random
+
+HEADER = ['first_name', 'last_name', 'user_id', 'URL', 'Company', 'Position',
+          'goals', 'preferences', 'communication_style']
+
+FIRST_NAMES = ['Jane', 'John', 'Aisha', 'Wei', 'Carlos', 'Fatima', 'Liam', 'Priya', 'Noah', 'Sofia',
+               'Omar', 'Elena', 'Kenji', 'Amara', 'Lucas', 'Mei', 'Ahmed', 'Olivia', 'Ravi', 'Zara']
+LAST_NAMES = ['Smith', 'Doe', 'Khan', 'Chen', 'Garcia', 'Patel', 'Müller', 'Okafor', 'Rossi', 'Kim',
+              'Nguyen', 'Silva', 'Ivanova', 'Tanaka', 'Haddad', 'Brown', 'Cohen', 'Larsen', 'Mensah', 'Ali']
+COMPANIES = ['Acme Corp', 'Globex', 'Initech', 'Umbrella', 'Stark Industries', 'Wayne Enterprises',
+             'Hooli', 'Pied Piper', 'Soylent', 'Vandelay Industries', 'Tyrell', 'Cyberdyne',
+             'Wonka Industries', 'Gringotts', 'Oscorp']
+POSITIONS = ['Software Engineer', 'Senior Software Engineer', 'Data Scientist', 'Product Manager',
+             'Engineering Manager', 'Designer', 'Recruiter', 'CTO', 'Sales Lead', 'Analyst']
+GOALS = ['hiring', 'mentorship', 'partnerships', 'fundraising', 'learning ML', 'career change', '']
+PREFERENCES = ['remote', 'hybrid', 'on-site', 'async', '']
+STYLES = ['concise', 'detailed', 'formal', 'casual', '']
+
+
+def generate_connections_csv(path: str, rows: int, seed: int = 0, batch: int = 10000):
+    """Write `rows` synthetic contacts to `path`, streaming in batches."""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for start in range(0, rows, batch):
+            writer.writerows(
+                [
+                    rng.choice(FIRST_NAMES),
+                    rng.choice(LAST_NAMES),
+                    user_id,
+                    f"https://www.linkedin.com/in/user-{user_id}",
+                    rng.choice(COMPANIES),
+                    rng.choice(POSITIONS),
+                    rng.choice(GOALS),
+                    rng.choice(PREFERENCES),
+                    rng.choice(STYLES),
+                ]
+                for user_id in range(start, min(start + batch, rows))
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--out', default='Connections.csv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate_connections_csv(args.out, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to {args.out}")
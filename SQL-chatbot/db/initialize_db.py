@@ -1,19 +1,196 @@
-import sqlite3
-import pandas as pd
+import csv
+import hashlib
 import os
+import sqlite3
+import time
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'data.db')
 CSV_PATH = os.path.join(os.getcwd(), 'Connections.csv')
 
-def init_db():
+TABLE_NAME = 'connections'
+META_TABLE = 'ingest_meta'
+FTS_TABLE = 'connections_fts'
+CHUNK_SIZE = 5000
+# Declared TEXT COLLATE NOCASE and indexed, so case-insensitive = and
+# prefix LIKE lookups can use the index
+INDEXED_COLUMNS = ('first_name', 'last_name', 'Company', 'Position')
+FTS_COLUMNS = ('first_name', 'last_name', 'Company', 'Position', 'goals')
+# Bump when the table layout changes so existing databases get reloaded
+LOADER_VERSION = 2
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _ensure_meta_table(conn: sqlite3.Connection):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {META_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            csv_size INTEGER NOT NULL,
+            csv_mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            loaded_at REAL NOT NULL
+        )
+    """)
+
+
+def _stored_fingerprint(conn: sqlite3.Connection):
+    row = conn.execute(
+        f"SELECT csv_size, csv_mtime_ns, sha256 FROM {META_TABLE} "
+        "WHERE table_name = ? AND EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?)",
+        (TABLE_NAME, TABLE_NAME)
+    ).fetchone()
+    if row is None:
+        return None
+    return {'size': row[0], 'mtime_ns': row[1], 'sha256': row[2]}
+
+
+def get_fingerprint(db_path: str = DB_PATH):
+    """
+    Return the content hash of the CSV currently loaded into the database,
+    or None if nothing has been ingested yet.
+    """
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            f"SELECT sha256 FROM {META_TABLE} WHERE table_name = ?", (TABLE_NAME,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def _build_fts(conn: sqlite3.Connection, header):
+    """
+    Build an external-content FTS5 index over the searchable text columns.
+    Skipped when this SQLite build has no FTS5.
+    """
+    columns = [col for col in FTS_COLUMNS if col in header]
+    if not columns:
+        return
+    try:
+        conn.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"{', '.join(_quote(col) for col in columns)}, "
+            f"content='{TABLE_NAME}', content_rowid='rowid', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    except sqlite3.OperationalError as e:
+        if 'fts5' in str(e):
+            return
+        raise
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _load_csv(conn: sqlite3.Connection, csv_path: str, stat: os.stat_result, sha256: str) -> int:
+    """
+    Stream the CSV into the connections table in CHUNK_SIZE batches inside a
+    single transaction, then build the lookup indexes.
+    """
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        width = len(header)
+        # Name-like columns are case-insensitive text; NUMERIC affinity keeps
+        # everything else numeric where possible, as pandas inference used to
+        column_defs = ', '.join(
+            f"{_quote(col)} TEXT COLLATE NOCASE" if col in INDEXED_COLUMNS else f"{_quote(col)} NUMERIC"
+            for col in header
+        )
+        insert_sql = (
+            f"INSERT INTO {TABLE_NAME} VALUES ({', '.join('?' * width)})"
+        )
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+            conn.execute(f"DROP TABLE IF EXISTS {TABLE_NAME}")
+            conn.execute(f"CREATE TABLE {TABLE_NAME} ({column_defs})")
+
+            row_count = 0
+            batch = []
+            for row in reader:
+                if len(row) != width:
+                    row = (row + [''] * width)[:width]
+                # Empty cells become NULL, matching pandas' NaN handling
+                batch.append([value if value != '' else None for value in row])
+                if len(batch) >= CHUNK_SIZE:
+                    conn.executemany(insert_sql, batch)
+                    row_count += len(batch)
+                    batch = []
+            if batch:
+                conn.executemany(insert_sql, batch)
+                row_count += len(batch)
+
+            for col in INDEXED_COLUMNS:
+                if col in header:
+                    conn.execute(
+                        f"CREATE INDEX idx_{TABLE_NAME}_{col.lower()} "
+                        f"ON {TABLE_NAME} ({_quote(col)} COLLATE NOCASE)"
+                    )
+            _build_fts(conn, header)
+
+            _ensure_meta_table(conn)
+            conn.execute(
+                f"INSERT OR REPLACE INTO {META_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                (TABLE_NAME, stat.st_size, stat.st_mtime_ns, sha256, row_count, time.time())
+            )
+            conn.execute(f"PRAGMA user_version = {LOADER_VERSION}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return row_count
+
+
+def init_db(force: bool = False) -> bool:
     """
     Initialize the SQLite database from the CSV.
+
+    Ingestion is skipped when the CSV's size, mtime and content hash match
+    the last load. Returns True if the table was (re)loaded.
     """
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_csv(CSV_PATH)
-    df.to_sql('connections', conn, if_exists='replace', index=False)
-    conn.close()
+    stat = os.stat(CSV_PATH)
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        _ensure_meta_table(conn)
+        outdated = conn.execute("PRAGMA user_version").fetchone()[0] != LOADER_VERSION
+        stored = None if force or outdated else _stored_fingerprint(conn)
+
+        # Cheap check first: an untouched file never needs hashing
+        if stored and stored['size'] == stat.st_size and stored['mtime_ns'] == stat.st_mtime_ns:
+            return False
+
+        sha256 = _file_sha256(CSV_PATH)
+        if stored and stored['sha256'] == sha256:
+            # Touched but identical: remember the new mtime and skip the load
+            conn.execute(
+                f"UPDATE {META_TABLE} SET csv_size = ?, csv_mtime_ns = ? WHERE table_name = ?",
+                (stat.st_size, stat.st_mtime_ns, TABLE_NAME)
+            )
+            return False
+
+        _load_csv(conn, CSV_PATH, stat, sha256)
+        return True
+    finally:
+        conn.close()
+
 
 if __name__ == '__main__':
-    init_db()
-    print("Database initialized at data.db")
\ No newline at end of file
+    init_db(force=True)
+    print("Database initialized at data.db")
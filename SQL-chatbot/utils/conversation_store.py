@@ -0,0 +1,148 @@
+import atexit
+import io
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict
+
+import pandas as pd
+
+MEMORY_CAP_BYTES = int(os.getenv('CONVERSATION_MEMORY_CAP', str(32 * 1024 * 1024)))
+# Rows kept inline in session state; enough for format_data_naturally
+PREVIEW_ROWS = 8
+
+# Spill files live in a private (0700) directory created per process, so no
+# other local user can pre-create it or plant the pickles _deserialize loads
+_store_dir = None
+_store_dir_lock = threading.Lock()
+
+
+def _private_store_dir() -> str:
+    global _store_dir
+    with _store_dir_lock:
+        if _store_dir is None:
+            _store_dir = tempfile.mkdtemp(prefix='sql_chatbot_sessions_')
+            atexit.register(shutil.rmtree, _store_dir, ignore_errors=True)
+        return _store_dir
+
+
+def _serialize(df: pd.DataFrame):
+    """Parquet when pyarrow can encode the frame, pickle otherwise."""
+    try:
+        buf = io.BytesIO()
+        df.to_parquet(buf, index=False)
+        return 'parquet', buf.getvalue()
+    except Exception:
+        # No parquet engine installed, or mixed-type columns it rejects
+        return 'pickle', pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _deserialize(fmt: str, blob: bytes) -> pd.DataFrame:
+    if fmt == 'parquet':
+        return pd.read_parquet(io.BytesIO(blob))
+    return pickle.loads(blob)
+
+
+def _remove_file(path: str):
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+class ConversationStore:
+    """
+    Per-session store for query results.
+
+    Messages in session state keep only a small preview frame and a handle.
+    Full frames are written through to a session-private SQLite file and a
+    bounded, LRU-evicted set of them is kept in memory for quick reuse.
+    """
+
+    def __init__(self, memory_cap: int = MEMORY_CAP_BYTES, directory: str = None):
+        # An explicit directory must be trusted: stored results are unpickled from it
+        if directory is None:
+            directory = _private_store_dir()
+        else:
+            os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{uuid.uuid4().hex}.db")
+        self.memory_cap = memory_cap
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (handle TEXT PRIMARY KEY, format TEXT NOT NULL, data BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        # Delete the spill file once the session's store is garbage collected
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+
+    @staticmethod
+    def preview(df: pd.DataFrame) -> pd.DataFrame:
+        return df.head(PREVIEW_ROWS).copy()
+
+    def _remember(self, handle: str, df: pd.DataFrame):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.memory_cap:
+            return
+        self._memory[handle] = (df, nbytes)
+        self._memory_bytes += nbytes
+        while self._memory_bytes > self.memory_cap:
+            _, (_, evicted_bytes) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_bytes
+            self._evictions += 1
+
+    def put(self, df: pd.DataFrame) -> str:
+        """Persist a result frame and return its handle."""
+        handle = uuid.uuid4().hex
+        fmt, blob = _serialize(df)
+        with self._lock:
+            self._conn.execute("INSERT INTO results VALUES (?, ?, ?)", (handle, fmt, blob))
+            self._conn.commit()
+            self._remember(handle, df)
+        return handle
+
+    def get(self, handle: str) -> pd.DataFrame:
+        """Load a result frame, from memory if it is still resident."""
+        with self._lock:
+            entry = self._memory.get(handle)
+            if entry is not None:
+                self._memory.move_to_end(handle)
+                return entry[0]
+            row = self._conn.execute(
+                "SELECT format, data FROM results WHERE handle = ?", (handle,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(handle)
+            df = _deserialize(*row)
+            self._remember(handle, df)
+            return df
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM results").fetchone()
+            return {
+                'stored': stored[0],
+                'disk_bytes': stored[1],
+                'in_memory': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'memory_cap': self.memory_cap,
+                'evictions': self._evictions,
+            }
@@ -1,20 +1,504 @@
+import os
+import queue
+import re
 import sqlite3
-from typing import List, Tuple, Any
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Tuple, Any, Dict, Optional, Sequence
+
+from db.initialize_db import META_TABLE, TABLE_NAME
+from utils.query_guard import execution_budget, guard_query
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: fall back to plain per-column tuples
+    pa = None
 
 DB_PATH = 'db/data.db'
+PAGE_SIZE = 50
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Tuning applied once to every pooled connection when it is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA mmap_size = 268435456",   # 256 MB memory-mapped reads
+    "PRAGMA cache_size = -65536",     # 64 MB page cache per connection
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of warm, read-only SQLite connections.
+
+    The pool lives at module level, so it survives Streamlit reruns and is
+    shared by every session served by the same process.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, max_size: int = 8, timeout: float = 10.0):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._wal_checked = False
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+
+    def _ensure_wal(self):
+        # journal_mode is persistent in the database file but can only be
+        # changed through a writable connection, so do it once per pool.
+        if self._wal_checked:
+            return
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+        self._wal_checked = True
+
+    def _open(self) -> sqlite3.Connection:
+        self._ensure_wal()
+        uri = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Take a connection from the pool, opening a new one while below
+        max_size and otherwise waiting up to `timeout` seconds.
+        """
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._hits += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._created < self.max_size
+            if can_open:
+                self._created += 1
+                self._misses += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available after {self.timeout}s")
+        with self._lock:
+            self._hits += 1
+            self._waits += 1
+            self._wait_time += time.perf_counter() - start
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool."""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection and reset the pool."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool hit/miss and wait-time counters."""
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                'size': self._created,
+                'idle': self._idle.qsize(),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / requests if requests else 0.0,
+                'waits': self._waits,
+                'total_wait_ms': self._wait_time * 1000,
+                'avg_wait_ms': self._wait_time * 1000 / self._waits if self._waits else 0.0,
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def _strip_sql(query: str) -> str:
+    return query.strip().rstrip(';').strip()
 
-def execute_query(query: str) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+
+_SQL_TOKEN_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+|[^'\"\s]+")
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Canonical form of a statement for cache keys: whitespace collapsed,
+    trailing semicolons dropped and everything outside string literals and
+    quoted identifiers lowercased.
+    """
+    parts = []
+    for match in _SQL_TOKEN_RE.finditer(_strip_sql(query)):
+        token = match.group(0)
+        if match.group(1):
+            parts.append(token)
+        elif token.isspace():
+            parts.append(' ')
+        else:
+            parts.append(token.lower())
+    return ''.join(parts)
+
+
+def _encode_rows(rows: List[Tuple[Any, ...]], width: int):
+    """
+    Store rows column-wise: an Arrow table when pyarrow is available and
+    the column types allow it, per-column tuples otherwise.
+    Returns (payload, approximate size in bytes).
+    """
+    columns = list(zip(*rows)) if rows else [()] * width
+    if pa is not None:
+        try:
+            arrays = [pa.array(col) for col in columns]
+            # Arrow would silently widen mixed int/float columns to double
+            if not any(pa.types.is_floating(arr.type) and any(type(v) is int for v in col)
+                       for arr, col in zip(arrays, columns)):
+                table = pa.table({str(i): arr for i, arr in enumerate(arrays)})
+                return table, table.nbytes
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass  # SQLite columns can mix types; keep those as tuples
+    nbytes = sum(sys.getsizeof(col) + sum(sys.getsizeof(v) for v in col) for col in columns)
+    return tuple(columns), nbytes
+
+
+def _decode_rows(payload) -> List[Tuple[Any, ...]]:
+    if pa is not None and isinstance(payload, pa.Table):
+        return list(zip(*(col.to_pylist() for col in payload.columns)))
+    return list(zip(*payload))
+
+
+class ResultCache:
+    """
+    Memory-bounded LRU cache of query results keyed on normalized SQL.
+
+    Entries are dropped wholesale whenever the database changes, detected
+    through PRAGMA data_version on a dedicated connection (the value is only
+    comparable on the same connection) together with the ingestion
+    fingerprint recorded by init_db.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.pool = pool
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._version = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _current_version(self):
+        if self._version_conn is None:
+            self._version_conn = self.pool._open()
+        data_version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+        try:
+            row = self._version_conn.execute(
+                f"SELECT sha256 FROM {META_TABLE} WHERE table_name = ?", (TABLE_NAME,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        return data_version, row[0] if row else None
+
+    def _check_version(self):
+        version = self._current_version()
+        if version != self._version:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key):
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes: int):
+        with self._lock:
+            if nbytes > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'storage': 'arrow' if pa is not None else 'columnar tuples',
+            }
+
+
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide result cache, creating it on first use."""
+    global _result_cache
+    if _result_cache is None:
+        pool = get_pool()
+        with _pool_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(pool)
+    return _result_cache
+
+
+def _cached_page(key, load):
+    """
+    Serve (columns, rows, exhausted) from the result cache, calling load()
+    and storing its output on a miss.
+    """
+    cache = get_result_cache()
+    hit = cache.get(key)
+    if hit is not None:
+        columns, payload, exhausted = hit
+        return columns, _decode_rows(payload), exhausted
+    columns, rows, exhausted = load()
+    payload, nbytes = _encode_rows(rows, len(columns))
+    cache.put(key, (columns, payload, exhausted), nbytes + sys.getsizeof(columns))
+    return columns, rows, exhausted
+
+
+def execute_query(query: str, params: Sequence[Any] = ()) -> Tuple[List[str], List[Tuple[Any, ...]]]:
     """
     Execute a SQL query and return column names and rows.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    try:
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        rows = cursor.fetchall()
-        conn.close()
-        return columns, rows
-    except Exception as e:
-        conn.close()
-        raise
\ No newline at end of file
+    with get_pool().connection() as conn:
+        query, _ = guard_query(conn, _strip_sql(query), params)
+        cursor = conn.cursor()
+        try:
+            with execution_budget(conn, query, params):
+                cursor.execute(query, params)
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                rows = cursor.fetchall()
+            return columns, rows
+        finally:
+            cursor.close()
+
+
+class PagedResult:
+    """
+    First page of a query result. The total row count and later pages are
+    fetched on demand, so large results never sit in memory as a whole.
+    """
+
+    def __init__(self, query: str, columns: List[str], rows: List[Tuple[Any, ...]],
+                 page_size: int, exhausted: bool, guard: Optional[Dict[str, Any]] = None,
+                 params: Sequence[Any] = ()):
+        self.query = query
+        self.params = tuple(params)
+        self.columns = columns
+        self.rows = rows
+        self.page_size = page_size
+        # query_guard report: plan, full scans, cross join, LIMIT added
+        self.guard = guard or {}
+        self._total = len(rows) if exhausted else None
+
+    @property
+    def total(self) -> int:
+        """Total number of rows, counted with a separate COUNT(*) on first access."""
+        if self._total is None:
+            self._total = count_rows(self.query, self.params)
+        return self._total
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-self.total // self.page_size))
+
+    def fetch_page(self, page: int) -> List[Tuple[Any, ...]]:
+        if page == 0:
+            return self.rows
+        return fetch_page(self.query, page, self.page_size, self.params)[1]
+
+
+def execute_paged(query: str, page_size: int = PAGE_SIZE, params: Sequence[Any] = ()) -> PagedResult:
+    """
+    Execute a SQL query and return only its first page of rows.
+    """
+    params = tuple(params)
+    with get_pool().connection() as conn:
+        # Risky plans get a LIMIT; later pages and the count reuse the guarded query
+        query, guard = guard_query(conn, _strip_sql(query), params)
+
+    def load():
+        with get_pool().connection() as conn:
+            cursor = conn.cursor()
+            try:
+                with execution_budget(conn, query, params):
+                    cursor.execute(query, params)
+                    columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                    # One extra row tells us whether a COUNT(*) is needed at all
+                    rows = cursor.fetchmany(page_size + 1) if columns else []
+            finally:
+                cursor.close()
+        return columns, rows[:page_size], len(rows) <= page_size
+
+    columns, rows, exhausted = _cached_page(('page', normalize_sql(query), params, 0, page_size), load)
+    return PagedResult(query, columns, rows, page_size, exhausted, guard, params)
+
+
+def _count_rows(query: str, params: Tuple[Any, ...]) -> int:
+    count_query = f"SELECT COUNT(*) FROM ({query})"
+    with get_pool().connection() as conn:
+        try:
+            with execution_budget(conn, count_query, params):
+                return conn.execute(count_query, params).fetchone()[0]
+        except sqlite3.OperationalError:
+            pass
+        # Not wrappable as a subquery (e.g. PRAGMA): count by streaming
+        with execution_budget(conn, query, params):
+            cursor = conn.execute(query, params)
+            total = 0
+            while True:
+                batch = cursor.fetchmany(1000)
+                if not batch:
+                    return total
+                total += len(batch)
+
+
+def count_rows(query: str, params: Sequence[Any] = ()) -> int:
+    """
+    Count the rows a query returns without materializing them.
+    """
+    query = _strip_sql(query)
+    params = tuple(params)
+    cache = get_result_cache()
+    key = ('count', normalize_sql(query), params)
+    total = cache.get(key)
+    if total is None:
+        total = _count_rows(query, params)
+        cache.put(key, total, sys.getsizeof(total))
+    return total
+
+
+def fetch_page(query: str, page: int, page_size: int = PAGE_SIZE,
+               params: Sequence[Any] = ()) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+    """
+    Fetch one page (0-based) of a query's result.
+    """
+    query = _strip_sql(query)
+    params = tuple(params)
+
+    def load():
+        with get_pool().connection() as conn, execution_budget(conn, query, params):
+            try:
+                cursor = conn.execute(
+                    f"SELECT * FROM ({query}) LIMIT ? OFFSET ?", params + (page_size, page * page_size)
+                )
+            except sqlite3.OperationalError:
+                cursor = conn.execute(query, params)
+                for _ in range(page):
+                    if not cursor.fetchmany(page_size):
+                        break
+            try:
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                return columns, cursor.fetchmany(page_size), True
+            finally:
+                cursor.close()
+
+    columns, rows, _ = _cached_page(('page', normalize_sql(query), params, page, page_size), load)
+    return columns, rows
+
+
+def get_table_schema(table: str) -> List[Tuple[Any, ...]]:
+    """
+    Return PRAGMA table_info rows for a table.
+    """
+    with get_pool().connection() as conn:
+        return conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+
+
+def table_exists(name: str) -> bool:
+    """
+    Check whether a table (including virtual tables) exists.
+    """
+    with get_pool().connection() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone()
+        return row is not None
+
+
+def explain_query(query: str, params: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+    """
+    Compile a statement without running it and return its query plan.
+    Raises sqlite3.Error if the SQL is invalid.
+    """
+    with get_pool().connection() as conn:
+        return conn.execute(f"EXPLAIN QUERY PLAN {_strip_sql(query)}", params).fetchall()
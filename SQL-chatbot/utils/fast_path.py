@@ -0,0 +1,151 @@
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Words that mean the request is about the table, not a person's name
+_NOT_NAMES = {
+    'all', 'any', 'every', 'everyone', 'everybody', 'everything', 'me', 'my', 'our', 'the', 'them',
+    'connections', 'connection', 'contacts', 'contact', 'people', 'person', 'records', 'record',
+    'data', 'rows', 'list', 'top', 'latest', 'recent', 'new', 'some', 'who', 'what',
+}
+# Company names joined like this need real SQL, so leave them to Gemini
+_MULTI_VALUE_RE = re.compile(r",|\band\b|\bor\b|\bnot\b", re.IGNORECASE)
+# "from last month" and friends are time filters, not company names
+_TEMPORAL_RE = re.compile(
+    r"^(?:last|this|past|the past|previous|next|today|yesterday|\d{4}\b|\d+ (?:days?|weeks?|months?|years?))",
+    re.IGNORECASE)
+# "... in total" is a count of everything, not a company called "total"
+_NOT_COMPANIES = {'total', 'all', 'each', 'every', 'each company', 'every company'}
+# "Google in London", "Acme who joined recently": a company plus a filter Gemini has to write
+_QUALIFIER_RE = re.compile(
+    r"\b(?:in|at|from|for|with|who|that|which|since|during|based|located|living|near|as|on|by)\b", re.IGNORECASE)
+
+_PEOPLE = r"(?:connections|contacts|people)"
+_COUNT = r"(?:how many|count(?: of)?|number of)"
+
+# (intent, pattern) pairs, tried in order against the stripped question
+PATTERNS = (
+    ('count_all', re.compile(
+        rf"^{_COUNT}(?: my)? {_PEOPLE}(?: do i have| are there)?(?: in total| total)?$", re.IGNORECASE)),
+    ('count_at_company', re.compile(
+        rf"^{_COUNT}(?: my)? {_PEOPLE}(?: do i have| are there)? (?:at|in|from|working at|working for) (?P<company>.+)$",
+        re.IGNORECASE)),
+    ('works_at_company', re.compile(
+        rf"^(?:who|which {_PEOPLE}) (?:works?|is working|are working) (?:at|for) (?P<company>.+)$",
+        re.IGNORECASE)),
+    ('works_at_company', re.compile(
+        rf"^(?:show|list|find|get)(?: me)?(?: all)?(?: my)? {_PEOPLE} (?:who work |working )?(?:at|for) (?P<company>.+)$",
+        re.IGNORECASE)),
+    # Names must be capitalized as typed, so "find engineers" or "who is hiring" go to Gemini
+    ('person', re.compile(
+        r"^(?i:show|find|look up|lookup|who is)(?i: me)? (?P<first>[A-Z][\w'.-]*)(?: (?P<last>[A-Z][\w'.-]*))?$")),
+)
+
+
+def _like_prefix(value: str) -> str:
+    escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+
+def _clean_value(value: str) -> str:
+    return value.strip().strip('"\'`').strip()
+
+
+def compile_intent(intent: str, groups: Dict[str, str]) -> Optional[Tuple[str, Tuple[Any, ...]]]:
+    """
+    Turn a matched intent into parameterized SQL against the connections
+    table. Name and company columns use NOCASE collation, so plain = and
+    prefix LIKE are case-insensitive and indexed.
+    """
+    if intent == 'count_all':
+        return "SELECT COUNT(*) AS connection_count FROM connections", ()
+
+    if intent in ('count_at_company', 'works_at_company'):
+        company = _clean_value(groups['company'])
+        if (not company or company.lower() in _NOT_COMPANIES or _MULTI_VALUE_RE.search(company)
+                or _QUALIFIER_RE.search(company) or _TEMPORAL_RE.match(company)):
+            return None
+        where = "WHERE Company LIKE ? ESCAPE '\\'"
+        if intent == 'count_at_company':
+            return f"SELECT COUNT(*) AS connection_count FROM connections {where}", (_like_prefix(company),)
+        return f"SELECT * FROM connections {where}", (_like_prefix(company),)
+
+    if intent == 'person':
+        first, last = groups['first'], groups.get('last')
+        if first.lower() in _NOT_NAMES or (last and last.lower() in _NOT_NAMES):
+            return None
+        if last:
+            return "SELECT * FROM connections WHERE first_name = ? AND last_name = ?", (first, last)
+        return "SELECT * FROM connections WHERE first_name = ? OR last_name = ?", (first, first)
+
+    return None
+
+
+class FastPath:
+    """
+    Local intent matcher for formulaic questions. A match compiles straight
+    to parameterized SQL; anything else falls back to Gemini.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._matches: Dict[str, int] = {}
+        self._match_time = 0.0
+        self._llm_calls = 0
+        self._llm_time = 0.0
+
+    def match(self, question: str,
+              has_rows: Optional[Callable[[str, Tuple[Any, ...]], bool]] = None) -> Optional[Tuple[str, Tuple[Any, ...]]]:
+        """
+        Return (sql, params) for a recognised question, or None.
+
+        `has_rows(sql, params)` confirms a name lookup finds someone; a
+        capitalized phrase that is not a name ("Find Software Engineers")
+        then goes to Gemini instead of returning an empty answer.
+        """
+        start = time.perf_counter()
+        text = ' '.join(question.split()).rstrip(' ?.!')
+        result, matched_intent = None, None
+        for intent, pattern in PATTERNS:
+            found = pattern.match(text)
+            if found:
+                result = compile_intent(intent, found.groupdict())
+                if result is not None and intent == 'person' and has_rows is not None and not has_rows(*result):
+                    result = None
+                if result is not None:
+                    matched_intent = intent
+                    break
+        with self._lock:
+            self._lookups += 1
+            if matched_intent:
+                self._matches[matched_intent] = self._matches.get(matched_intent, 0) + 1
+                self._match_time += time.perf_counter() - start
+        return result
+
+    def record_llm_latency(self, seconds: float):
+        """Feed in observed Gemini latency so saved time can be estimated."""
+        with self._lock:
+            self._llm_calls += 1
+            self._llm_time += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            matches = sum(self._matches.values())
+            avg_llm = self._llm_time / self._llm_calls if self._llm_calls else 0.0
+            return {
+                'lookups': self._lookups,
+                'matches': matches,
+                'match_rate': matches / self._lookups if self._lookups else 0.0,
+                'by_intent': dict(self._matches),
+                'avg_llm_latency_s': avg_llm,
+                'saved_latency_s': max(matches * avg_llm - self._match_time, 0.0),
+            }
+
+
+_fast_path = FastPath()
+
+
+def get_fast_path() -> FastPath:
+    return _fast_path
@@ -1,24 +1,154 @@
+import asyncio
 import os
+import random
+import time
+from typing import AsyncIterator, Iterator, Optional
+
+import httpx
 from google import genai
+from google.genai import errors, types
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DEFAULT_MODEL = 'gemini-2.0-flash-001'
+# HTTP status codes worth retrying: rate limiting and transient server errors
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, errors.APIError):
+        return exc.code in TRANSIENT_STATUS_CODES
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError, TimeoutError, ConnectionError))
+
+
 class GeminiClient:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, timeout: float = 30.0, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0):
         # Use GEMINI_API_KEY or GOOGLE_API_KEY
         self.api_key = api_key or os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY')
         if not self.api_key:
             raise ValueError('GEMINI_API_KEY environment variable not set')
         # Initialize the Gen AI client (Developer API)
         self.client = genai.Client(api_key=self.api_key)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _config(self, deadline: float) -> types.GenerateContentConfig:
+        remaining = max(deadline - time.monotonic(), 0.001)
+        return types.GenerateContentConfig(
+            http_options=types.HttpOptions(timeout=int(remaining * 1000))
+        )
+
+    def _backoff(self, attempt: int, deadline: float) -> Optional[float]:
+        """Full-jitter exponential backoff, or None once the deadline is spent."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _deadline(self, timeout: Optional[float]) -> float:
+        return time.monotonic() + (timeout if timeout is not None else self.timeout)
 
-    def generate_sql(self, prompt: str, model: str = 'gemini-2.0-flash-001') -> str:
+    def generate_sql(self, prompt: str, model: str = DEFAULT_MODEL, timeout: Optional[float] = None) -> str:
         """
         Generate a SQL query from natural language using Gemini.
+
+        `timeout` is an overall deadline in seconds covering every retry.
         """
-        response = self.client.models.generate_content(
-            model=model,
-            contents=prompt
-        )
-        return response.text.strip()
\ No newline at end of file
+        deadline = self._deadline(timeout)
+        attempt = 0
+        while True:
+            try:
+                response = self.client.models.generate_content(
+                    model=model,
+                    contents=prompt,
+                    config=self._config(deadline)
+                )
+                return response.text.strip()
+            except Exception as e:
+                delay = self._backoff(attempt, deadline) if _is_transient(e) else None
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+
+    def stream_sql(self, prompt: str, model: str = DEFAULT_MODEL, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Yield the generated SQL text chunk by chunk as Gemini produces it.
+
+        Transient failures are retried only before the first chunk arrives,
+        so callers never see duplicated output.
+        """
+        deadline = self._deadline(timeout)
+        attempt = 0
+        while True:
+            started = False
+            try:
+                for chunk in self.client.models.generate_content_stream(
+                        model=model,
+                        contents=prompt,
+                        config=self._config(deadline)):
+                    if time.monotonic() > deadline:
+                        raise TimeoutError('Gemini stream exceeded its deadline')
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+                return
+            except Exception as e:
+                delay = self._backoff(attempt, deadline) if _is_transient(e) and not started else None
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+
+    async def agenerate_sql(self, prompt: str, model: str = DEFAULT_MODEL, timeout: Optional[float] = None) -> str:
+        """Async variant of generate_sql."""
+        deadline = self._deadline(timeout)
+        attempt = 0
+        while True:
+            try:
+                response = await asyncio.wait_for(
+                    self.client.aio.models.generate_content(
+                        model=model,
+                        contents=prompt,
+                        config=self._config(deadline)
+                    ),
+                    timeout=max(deadline - time.monotonic(), 0.001)
+                )
+                return response.text.strip()
+            except Exception as e:
+                delay = self._backoff(attempt, deadline) if _is_transient(e) else None
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def astream_sql(self, prompt: str, model: str = DEFAULT_MODEL,
+                          timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Async variant of stream_sql."""
+        deadline = self._deadline(timeout)
+        attempt = 0
+        while True:
+            started = False
+            try:
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=model,
+                    contents=prompt,
+                    config=self._config(deadline)
+                )
+                async for chunk in stream:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError('Gemini stream exceeded its deadline')
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+                return
+            except Exception as e:
+                delay = self._backoff(attempt, deadline) if _is_transient(e) and not started else None
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
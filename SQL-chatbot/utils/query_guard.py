@@ -0,0 +1,130 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Rows a flagged query may return before the guard caps it with a LIMIT
+AUTO_LIMIT = int(os.getenv('QUERY_AUTO_LIMIT', '10000'))
+# Runtime budgets enforced through sqlite3's progress handler
+QUERY_TIMEOUT = float(os.getenv('QUERY_TIMEOUT', '10'))
+QUERY_MAX_STEPS = int(os.getenv('QUERY_MAX_STEPS', '200000000'))
+PROGRESS_INTERVAL = 10000  # VM instructions between handler calls
+
+_LIMIT_RE = re.compile(r"\blimit\s+\d+(\s*(,|offset)\s*\d+)?\s*$", re.IGNORECASE)
+_SCAN_RE = re.compile(r"^SCAN (\S+)")
+
+
+class QueryAborted(Exception):
+    """A query was stopped by its runtime budget."""
+
+    def __init__(self, reason: str, query: str, plan: List[Tuple[Any, ...]]):
+        self.reason = reason
+        self.query = query
+        self.plan = plan
+        plan_text = '\n'.join(f"  {row[-1]}" for row in plan) or '  (plan unavailable)'
+        super().__init__(f"Query aborted: {reason}\nPlan:\n{plan_text}")
+
+
+_lock = threading.Lock()
+_recent_aborts = deque(maxlen=20)
+_stats = {'checked': 0, 'limited': 0, 'aborted': 0}
+
+
+def explain(conn: sqlite3.Connection, query: str, params: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+    try:
+        return conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    except sqlite3.Error:
+        return []
+
+
+def analyze_plan(plan: List[Tuple[Any, ...]]) -> Dict[str, Any]:
+    """
+    Classify an EXPLAIN QUERY PLAN: tables read by full scans, nested-loop
+    cross joins (two or more full scans under the same parent) and sorts
+    that need a temporary b-tree.
+    """
+    full_scans = []
+    scans_by_parent: Dict[int, int] = {}
+    temp_sort = False
+    for row in plan:
+        parent, detail = row[1], row[-1]
+        match = _SCAN_RE.match(detail)
+        # FTS5 MATCH lookups show up as virtual-table scans but use the index
+        if match and 'VIRTUAL TABLE' not in detail:
+            full_scans.append(match.group(1))
+            scans_by_parent[parent] = scans_by_parent.get(parent, 0) + 1
+        if detail.startswith('USE TEMP B-TREE'):
+            temp_sort = True
+    return {
+        'full_scans': full_scans,
+        'cross_join': any(count > 1 for count in scans_by_parent.values()),
+        'temp_sort': temp_sort,
+    }
+
+
+def guard_query(conn: sqlite3.Connection, query: str, params: Sequence[Any] = ()) -> Tuple[str, Dict[str, Any]]:
+    """
+    Inspect a statement before it runs. Risky SELECTs (full scans, cross
+    joins, temp-b-tree sorts) without a LIMIT are wrapped in one of
+    AUTO_LIMIT rows. Returns the query to run and a report.
+    """
+    plan = explain(conn, query, params)
+    report = analyze_plan(plan)
+    report['plan'] = plan
+    report['limit_added'] = None
+
+    risky = report['full_scans'] or report['cross_join'] or report['temp_sort']
+    is_select = query.lstrip().lower().startswith(('select', 'with'))
+    if risky and is_select and not _LIMIT_RE.search(query):
+        query = f"SELECT * FROM ({query}) LIMIT {AUTO_LIMIT}"
+        report['limit_added'] = AUTO_LIMIT
+
+    with _lock:
+        _stats['checked'] += 1
+        if report['limit_added']:
+            _stats['limited'] += 1
+    return query, report
+
+
+@contextmanager
+def execution_budget(conn: sqlite3.Connection, query: str, params: Sequence[Any] = (),
+                     timeout: float = QUERY_TIMEOUT, max_steps: int = QUERY_MAX_STEPS):
+    """
+    Interrupt the statement running on `conn` once it exceeds its wall-clock
+    or VM-step budget, raising QueryAborted with the offending plan.
+    """
+    deadline = time.monotonic() + timeout
+    state = {'steps': 0, 'reason': None}
+
+    def handler():
+        state['steps'] += PROGRESS_INTERVAL
+        if state['steps'] > max_steps:
+            state['reason'] = f"exceeded {max_steps:,} VM steps"
+        elif time.monotonic() > deadline:
+            state['reason'] = f"exceeded {timeout:g}s wall-clock budget"
+        return 1 if state['reason'] else 0
+
+    conn.set_progress_handler(handler, PROGRESS_INTERVAL)
+    try:
+        yield
+    except sqlite3.OperationalError as e:
+        if not state['reason']:
+            raise
+        conn.set_progress_handler(None, 0)
+        abort = QueryAborted(state['reason'], query, explain(conn, query, params))
+        with _lock:
+            _stats['aborted'] += 1
+            _recent_aborts.append({'reason': abort.reason, 'query': query, 'plan': abort.plan,
+                                   'time': time.time()})
+        raise abort from e
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return dict(_stats, recent_aborts=list(_recent_aborts))
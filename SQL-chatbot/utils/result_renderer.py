@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+NOT_SPECIFIED = "*Not specified*"
+MAX_FULL_ROWS = 8
+PREVIEW_ROWS = 5
+PREVIEW_COLS = 5
+
+
+def format_data_naturally(df: pd.DataFrame, total=None) -> str:
+    """
+    Render a result frame as markdown records.
+
+    The shown block is stringified and NaN-filled column-wise in one pass and
+    each record is joined once, instead of walking rows with iterrows() and
+    growing one string cell by cell.
+    """
+    if df.empty:
+        return "🔍 No data found for your query."
+
+    # df may hold only the first page; total is the full row count
+    rows = total if total is not None else len(df)
+
+    if rows == 1:
+        summary = "📊 Found **1 record**:\n\n"
+    else:
+        summary = f"📊 Found **{rows} records**:\n\n"
+
+    if rows <= MAX_FULL_ROWS:
+        shown = df
+    else:
+        shown = df.iloc[:PREVIEW_ROWS, :PREVIEW_COLS]
+
+    # Column-wise NaN handling and stringification over one object array,
+    # then a single join per record instead of per-cell concatenation.
+    # The array stays dtype=object: a fixed-width '<U' array would clip
+    # NOT_SPECIFIED to the widest value in the block.
+    values = shown.to_numpy(dtype=object)
+    text = np.vectorize(str, otypes=[object])(np.where(pd.isna(values), NOT_SPECIFIED, values))
+    labels = np.array([f"   • **{col}:** " for col in shown.columns], dtype=object)
+    cells = labels + text + "\n"
+    records = [f"**Record {n}:**\n" + ''.join(row) + "\n" for n, row in enumerate(cells.tolist(), 1)]
+
+    result_text = summary + ''.join(records)
+    if rows > MAX_FULL_ROWS:
+        result_text += f"*... and **{rows - PREVIEW_ROWS}** more records*\n"
+    return result_text
+
+
+def render_cached(cache: dict, msg: dict) -> str:
+    """
+    Render a result message once and reuse the output on every rerun.
+
+    `cache` maps message ids to rendered text, typically a dict kept in
+    st.session_state.
+    """
+    key = msg['id']
+    if key not in cache:
+        cache[key] = format_data_naturally(msg['content'], msg.get('total'))
+    return cache[key]
@@ -0,0 +1,225 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+CACHE_PATH = os.path.join('db', 'nl_cache.db')
+
+_TOKEN_RE = re.compile(r"[a-z0-9_@.']+")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    text = ' '.join(question.lower().split())
+    return text.rstrip(' ?.!')
+
+
+def _tokenize(text: str):
+    return _TOKEN_RE.findall(text)
+
+
+class SQLCache:
+    """
+    Disk-backed LRU cache of generated SQL with a TTL.
+
+    Entries are keyed on the normalized question plus a fingerprint of the
+    table schema and prompt template, so a schema or prompt change never
+    serves stale SQL. With near_duplicates enabled, a miss falls back to a
+    TF-IDF cosine lookup over cached questions with the same fingerprint.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = 1000, ttl: float = 7 * 24 * 3600,
+                 near_duplicates: bool = False, similarity_threshold: float = 0.9):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.near_duplicates = near_duplicates
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sql_cache (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                question TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                latency REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sql_cache_last_used ON sql_cache (last_used)")
+        self._conn.commit()
+
+        # TF-IDF index: key -> (fingerprint, term counts), plus document frequencies
+        self._docs: Dict[str, tuple] = {}
+        self._df: Counter = Counter()
+        if near_duplicates:
+            for key, fingerprint, question in self._conn.execute(
+                    "SELECT key, fingerprint, question FROM sql_cache"):
+                self._index_add(key, fingerprint, question)
+
+        self._hits = 0
+        self._near_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._saved_latency = 0.0
+
+    @staticmethod
+    def make_key(question: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{fingerprint}\x00{normalize_question(question)}".encode()).hexdigest()
+
+    def _index_add(self, key: str, fingerprint: str, question: str):
+        terms = Counter(_tokenize(question))
+        self._docs[key] = (fingerprint, terms)
+        self._df.update(terms.keys())
+
+    def _index_remove(self, key: str):
+        doc = self._docs.pop(key, None)
+        if doc:
+            self._df.subtract(doc[1].keys())
+
+    def _weights(self, terms: Counter) -> Dict[str, float]:
+        n_docs = len(self._docs) + 1
+        weights = {
+            term: count * (math.log(n_docs / (1 + self._df.get(term, 0))) + 1.0)
+            for term, count in terms.items()
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {term: w / norm for term, w in weights.items()}
+
+    def _nearest(self, question: str, fingerprint: str) -> Optional[str]:
+        query = self._weights(Counter(_tokenize(normalize_question(question))))
+        best_key, best_score = None, 0.0
+        for key, (doc_fingerprint, terms) in self._docs.items():
+            if doc_fingerprint != fingerprint:
+                continue
+            doc = self._weights(terms)
+            score = sum(w * doc.get(term, 0.0) for term, w in query.items())
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key if best_score >= self.similarity_threshold else None
+
+    def _delete(self, key: str):
+        self._conn.execute("DELETE FROM sql_cache WHERE key = ?", (key,))
+        self._index_remove(key)
+
+    def get(self, question: str, fingerprint: str) -> Optional[str]:
+        """Return cached SQL for the question, or None on a miss."""
+        key = self.make_key(question, fingerprint)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sql, latency, created_at FROM sql_cache WHERE key = ?", (key,)
+            ).fetchone()
+            near = False
+            if row is None and self.near_duplicates:
+                near_key = self._nearest(question, fingerprint)
+                if near_key:
+                    key, near = near_key, True
+                    row = self._conn.execute(
+                        "SELECT sql, latency, created_at FROM sql_cache WHERE key = ?", (key,)
+                    ).fetchone()
+
+            if row is not None and now - row[2] > self.ttl:
+                self._delete(key)
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self._misses += 1
+                return None
+
+            self._conn.execute("UPDATE sql_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            if near:
+                self._near_hits += 1
+            else:
+                self._hits += 1
+            self._saved_latency += row[1]
+            return row[0]
+
+    def put(self, question: str, fingerprint: str, sql: str, latency: float):
+        """Store generated SQL with the latency it took to produce."""
+        key = self.make_key(question, fingerprint)
+        now = time.time()
+        with self._lock:
+            self._index_remove(key)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sql_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, fingerprint, normalize_question(question), sql, latency, now, now)
+            )
+            if self.near_duplicates:
+                self._index_add(key, fingerprint, normalize_question(question))
+
+            count = self._conn.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+            if count > self.max_entries:
+                stale = self._conn.execute(
+                    "SELECT key FROM sql_cache ORDER BY last_used LIMIT ?", (count - self.max_entries,)
+                ).fetchall()
+                for (stale_key,) in stale:
+                    self._delete(stale_key)
+                self._evictions += len(stale)
+            self._conn.commit()
+
+    def invalidate(self, question: str, fingerprint: str, sql: Optional[str] = None):
+        """
+        Drop the entry for a question, e.g. when its SQL failed to compile or
+        run. With `sql`, entries holding that same SQL under the fingerprint
+        are dropped too, so a near-duplicate hit cannot serve it again.
+        """
+        key = self.make_key(question, fingerprint)
+        with self._lock:
+            keys = {key}
+            if sql is not None:
+                keys.update(row[0] for row in self._conn.execute(
+                    "SELECT key FROM sql_cache WHERE fingerprint = ? AND sql = ?", (fingerprint, sql)))
+            for stale_key in keys:
+                self._delete(stale_key)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM sql_cache")
+            self._conn.commit()
+            self._docs.clear()
+            self._df.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate and saved Gemini latency, for tuning size and TTL."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+            lookups = self._hits + self._near_hits + self._misses
+            return {
+                'entries': entries,
+                'hits': self._hits,
+                'near_hits': self._near_hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits + self._near_hits) / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'saved_latency_s': self._saved_latency,
+            }
+
+
+_cache: Optional[SQLCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_sql_cache() -> SQLCache:
+    """Return the process-wide SQL cache, configured from the environment."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SQLCache(
+                    path=os.getenv('SQL_CACHE_PATH', CACHE_PATH),
+                    max_entries=int(os.getenv('SQL_CACHE_MAX_ENTRIES', '1000')),
+                    ttl=float(os.getenv('SQL_CACHE_TTL', str(7 * 24 * 3600))),
+                    near_duplicates=os.getenv('SQL_CACHE_NEAR_DUPLICATES', '0') == '1',
+                )
+    return _cache
@@ -1,19 +1,115 @@
+import hashlib
+import sqlite3
+import time
+from typing import Iterator
 from utils.gemini_client import GeminiClient
+from utils.db_utils import explain_query, get_table_schema, table_exists
+from utils.sql_cache import get_sql_cache
+from utils.fast_path import get_fast_path
+
+# Construct a robust prompt to handle name splitting and case-insensitive matching
+PROMPT_TEMPLATE = (
+    "You are an expert SQL assistant for a SQLite table named 'connections' with columns: "
+    "first_name, last_name, user_id, URL, Company, Position, goals, preferences, communication_style. "
+    "{search_hints}"
+    "If the user provides a full name (e.g., 'John Doe'), split on whitespace: use the first token as first_name and the last token as last_name. "
+    "If only one name is given, match it against either first_name or last_name. "
+    "Convert the following user request into a valid SQL SELECT query. "
+    "Request: {nl_query}\n"
+    "Respond with only the SQL query, and do not include code fences."
+)
+
+# Point Gemini at the NOCASE indexes and FTS5 table built by init_db, so
+# name and company lookups avoid LOWER(...) and LIKE '%...%' full scans
+NOCASE_HINT = (
+    "The columns first_name, last_name, Company and Position are indexed with case-insensitive (NOCASE) collation: "
+    "compare them directly with = or a prefix LIKE 'abc%', and never wrap them in LOWER() or UPPER(). "
+)
+FTS_HINT = (
+    "For keyword or partial-word searches over first_name, last_name, Company, Position or goals, do not use LIKE '%...%'; "
+    "use the full-text index instead: connections.rowid IN (SELECT rowid FROM connections_fts WHERE connections_fts MATCH 'term'). "
+    "Restrict a search to one column with MATCH 'Company:term' and match word prefixes with MATCH 'term*'. "
+)
+
+
+def strip_code_fences(sql: str) -> str:
+    """Drop ``` fence lines Gemini sometimes wraps around the SQL."""
+    return '\n'.join(line for line in sql.splitlines() if not line.strip().startswith('```')).strip()
+
 
 class SQLGenerator:
-    def __init__(self, api_key=None):
-        self.client = GeminiClient(api_key)
+    def __init__(self, api_key=None, cache=None, client=None):
+        # client can be any object with GeminiClient's methods (e.g. a benchmark fake)
+        self.client = client if client is not None else GeminiClient(api_key)
+        self.cache = cache if cache is not None else get_sql_cache()
+
+    def template(self) -> str:
+        """Prompt template with search hints matching the indexes that exist."""
+        hints = NOCASE_HINT + (FTS_HINT if table_exists('connections_fts') else '')
+        return PROMPT_TEMPLATE.format(search_hints=hints, nl_query='{nl_query}')
+
+    def fingerprint(self, template: str) -> str:
+        """Fingerprint of the live table schema and the prompt template."""
+        schema = repr(get_table_schema('connections'))
+        return hashlib.sha256(f"{schema}\x00{template}".encode()).hexdigest()
+
+    def _record(self, nl_query: str, fingerprint: str, sql: str, latency: float):
+        # Observed Gemini latency is what each fast-path match saves
+        get_fast_path().record_llm_latency(latency)
+        # Only SQL that compiles is cached; anything else is regenerated next time
+        try:
+            explain_query(strip_code_fences(sql))
+        except sqlite3.Error:
+            return
+        self.cache.put(nl_query, fingerprint, sql, latency)
+
+    def invalidate(self, nl_query: str, sql: str = None):
+        """Forget the cached SQL for a question after it failed EXPLAIN or execution."""
+        self.cache.invalidate(nl_query, self.fingerprint(self.template()), sql)
 
     def nl_to_sql(self, nl_query: str) -> str:
-        # Construct a robust prompt to handle name splitting and case-insensitive matching
-        prompt = (
-            "You are an expert SQL assistant for a SQLite table named 'connections' with columns: "
-            "first_name, last_name, user_id, URL, Company, Position, goals, preferences, communication_style. "
-            "When matching names, perform case-insensitive comparison. "
-            "If the user provides a full name (e.g., 'John Doe'), split on whitespace: use the first token as first_name and the last token as last_name. "
-            "If only one name is given, match it against either first_name or last_name. "
-            "Convert the following user request into a valid SQL SELECT query. "
-            f"Request: {nl_query}\n"
-            "Respond with only the SQL query, and do not include code fences."
-        )
-        return self.client.generate_sql(prompt)
\ No newline at end of file
+        template = self.template()
+        fingerprint = self.fingerprint(template)
+        cached = self.cache.get(nl_query, fingerprint)
+        if cached is not None:
+            return cached
+
+        prompt = template.format(nl_query=nl_query)
+        start = time.perf_counter()
+        sql = self.client.generate_sql(prompt)
+        self._record(nl_query, fingerprint, sql, time.perf_counter() - start)
+        return sql
+
+    def stream_sql(self, nl_query: str) -> Iterator[str]:
+        """
+        Yield SQL text as Gemini generates it. A cache hit is yielded whole;
+        a completed stream is stored in the cache like nl_to_sql.
+        """
+        template = self.template()
+        fingerprint = self.fingerprint(template)
+        cached = self.cache.get(nl_query, fingerprint)
+        if cached is not None:
+            yield cached
+            return
+
+        prompt = template.format(nl_query=nl_query)
+        start = time.perf_counter()
+        chunks = []
+        for chunk in self.client.stream_sql(prompt):
+            chunks.append(chunk)
+            yield chunk
+        self._record(nl_query, fingerprint, ''.join(chunks).strip(), time.perf_counter() - start)
+
+    async def anl_to_sql(self, nl_query: str) -> str:
+        """Async variant of nl_to_sql."""
+        template = self.template()
+        fingerprint = self.fingerprint(template)
+        cached = self.cache.get(nl_query, fingerprint)
+        if cached is not None:
+            return cached
+
+        prompt = template.format(nl_query=nl_query)
+        start = time.perf_counter()
+        sql = await self.client.agenerate_sql(prompt)
+        self._record(nl_query, fingerprint, sql, time.perf_counter() - start)
+        return sql
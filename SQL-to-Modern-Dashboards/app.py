@@ -1,12 +1,50 @@
 import streamlit as st
-import asyncio
 import os
 from dotenv import load_dotenv
-from chat_agent import run_chat_agent
+from background_loop import BackgroundLoop
+from chat_agent import stream_chat_agent
 from dashboard_agent import run_dashboard_agent
 
 load_dotenv()
 
+@st.cache_resource
+def get_background_loop() -> BackgroundLoop:
+    """One event loop for the whole server, shared by every session and rerun."""
+    return BackgroundLoop()
+
+def run_async(coro):
+    """
+    Run an agent coroutine on the shared loop and wait for its result. The
+    script thread blocks meanwhile, so a rerun only takes effect once it is done.
+    """
+    return get_background_loop().run(coro)
+
+_EXHAUSTED = object()
+
+async def _next_item(agen):
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _EXHAUSTED
+
+async def _close(agen):
+    await agen.aclose()
+
+def iterate_async(agen):
+    """
+    Drive an async generator on the shared loop, one item per step, for
+    st.write_stream. A rerun stops the script between items, and the
+    generator is then closed so its pending work is cancelled.
+    """
+    try:
+        while True:
+            item = run_async(_next_item(agen))
+            if item is _EXHAUSTED:
+                return
+            yield item
+    finally:
+        get_background_loop().submit(_close(agen))
+
 # Initialize session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -33,23 +71,32 @@ with tab1:
             with st.chat_message("user"):
                 st.markdown(user_query)
         
-        with st.spinner("Fetching response..."):
-            try:
-                response = asyncio.run(run_chat_agent(user_query))
-                st.session_state.messages.append({"role": "assistant", "content": response})
-                with chat_container:
-                    with st.chat_message("assistant"):
-                        st.markdown(response)
-            except Exception as e:
-                st.error(f"Error: {e}")
+        try:
+            with chat_container:
+                with st.chat_message("assistant"):
+                    # Tokens render as they arrive; the query runs while the explanation streams
+                    response = st.write_stream(iterate_async(stream_chat_agent(user_query)))
+            st.session_state.messages.append({"role": "assistant", "content": response})
+        except Exception as e:
+            st.error(f"Error: {e}")
 
 # Dashboard Tab
 with tab2:
     st.header("Database Dashboard")
-    if st.button("Generate Dashboard"):
+    col1, col2, col3 = st.columns(3)
+    # Generate reuses the cached analysis, Refresh only re-runs stale metrics,
+    # Regenerate asks Gemini for new metrics
+    mode = None
+    if col1.button("Generate Dashboard"):
+        mode = "cached"
+    if col2.button("Refresh Data", disabled=not st.session_state.dashboard_html):
+        mode = "refresh"
+    if col3.button("Regenerate"):
+        mode = "regenerate"
+    if mode:
         with st.spinner("Generating dashboard..."):
             try:
-                html = asyncio.run(run_dashboard_agent("Analyze my database and suggest a dashboard"))
+                html = run_async(run_dashboard_agent("Analyze my database and suggest a dashboard", mode=mode))
                 st.session_state.dashboard_html = html
                 st.html(html)  # Removed height parameter
             except Exception as e:
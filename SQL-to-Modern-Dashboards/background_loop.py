@@ -0,0 +1,39 @@
+import asyncio
+import concurrent.futures
+import threading
+
+
+class BackgroundLoop:
+    """
+    A single long-lived asyncio event loop running on a daemon thread.
+
+    Streamlit reruns the script on every interaction; running agent
+    coroutines here instead of through asyncio.run() keeps the loop, and the
+    Gemini async client's connections bound to it, alive across reruns.
+    """
+
+    def __init__(self, name: str = "agent-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop; cancelling the future cancels the task."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """Submit a coroutine and block until it finishes, cancelling it if the caller is interrupted."""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Timeout, or an exception raised into the waiting thread
+            future.cancel()
+            raise
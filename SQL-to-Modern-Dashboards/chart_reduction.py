@@ -0,0 +1,141 @@
+import os
+from numbers import Real
+
+# Default point budgets per chart type; a metric may override with "max_points"
+POINT_BUDGETS = {
+    "scatter": int(os.getenv("CHART_MAX_POINTS", "2000")),
+    "line": int(os.getenv("CHART_MAX_POINTS", "2000")),
+    "bar": int(os.getenv("CHART_MAX_BARS", "50")),
+    "pie": int(os.getenv("CHART_MAX_SLICES", "10")),
+}
+# "lttb" keeps the visual shape of a series, "minmax" keeps every extreme
+SERIES_METHOD = os.getenv("CHART_SERIES_METHOD", "lttb")
+OTHER_LABEL = "Other"
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+
+def _all_numbers(values: list) -> bool:
+    return all(_is_number(v) for v in values)
+
+
+def lttb(x: list, y: list, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets downsampling. Keeps the first and last
+    points and, from each bucket in between, the point forming the largest
+    triangle with the previous pick and the next bucket's average.
+    x is used for geometry only if numeric, otherwise positions are.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return x, y
+    xs = x if _all_numbers(x) else range(n)
+    keep = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if next_end > next_start:
+            span = next_end - next_start
+            avg_x = sum(xs[next_start:next_end]) / span
+            avg_y = sum(y[next_start:next_end]) / span
+        else:
+            avg_x, avg_y = xs[n - 1], y[n - 1]
+        ax, ay = xs[a], y[a]
+        # Twice the area of the triangle (a, j, next bucket average)
+        dx, dy = ax - avg_x, avg_y - ay
+        best, best_area = start, -1.0
+        for j, xj, yj in zip(range(start, end), xs[start:end], y[start:end]):
+            area = abs(dx * (yj - ay) + (xj - ax) * dy)
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(n - 1)
+    return [x[i] for i in keep], [y[i] for i in keep]
+
+
+def minmax(x: list, y: list, threshold: int):
+    """Keep the min and max point of each of threshold/2 buckets, in order."""
+    n = len(y)
+    if threshold >= n or threshold < 2:
+        return x, y
+    buckets = threshold // 2
+    keep = []
+    for b in range(buckets):
+        start, end = b * n // buckets, (b + 1) * n // buckets
+        if start == end:
+            continue
+        lo = min(range(start, end), key=y.__getitem__)
+        hi = max(range(start, end), key=y.__getitem__)
+        keep.extend(sorted({lo, hi}))
+    return [x[i] for i in keep], [y[i] for i in keep]
+
+
+def stride(x: list, y: list, threshold: int):
+    """Evenly spaced sample; used when values are not numeric."""
+    n = len(y)
+    if threshold >= n or threshold < 1:
+        return x, y
+    keep = [i * n // threshold for i in range(threshold)]
+    return [x[i] for i in keep], [y[i] for i in keep]
+
+
+def top_n_other(labels: list, values: list, n: int):
+    """Sum values per label, keep the n-1 largest and fold the rest into "Other"."""
+    totals = {}
+    for label, value in zip(labels, values):
+        totals[label] = totals.get(label, 0) + (value if _is_number(value) else 0)
+    if len(totals) <= n:
+        return list(totals), list(totals.values())
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    kept, rest = ranked[:n - 1], ranked[n - 1:]
+    return [label for label, _ in kept] + [OTHER_LABEL], [value for _, value in kept] + [sum(v for _, v in rest)]
+
+
+def bucket_numeric(x: list, y: list, buckets: int):
+    """Sum y into equal-width x ranges, labelled by each range's lower bound."""
+    lo, hi = min(x), max(x)
+    width = (hi - lo) / buckets or 1
+    sums = [0] * buckets
+    for xv, yv in zip(x, y):
+        sums[min(int((xv - lo) / width), buckets - 1)] += yv if _is_number(yv) else 0
+    return [lo + i * width for i in range(buckets)], sums
+
+
+def reduce_chart(chart_type: str, first: list, second: list, max_points: int = None):
+    """
+    Fit a chart's series into its point budget.
+    Returns (first, second, reduction) where reduction is None when the
+    series already fits, else {"method", "original_points", "points"}.
+    """
+    budget = max_points or POINT_BUDGETS.get(chart_type)
+    original = len(first)
+    if not budget or original <= budget:
+        return first, second, None
+
+    if chart_type == "pie":
+        method = "top_n_other"
+        first, second = top_n_other(first, second, budget)
+    elif chart_type == "bar":
+        if _all_numbers(first) and _all_numbers(second):
+            method = "bucket_sum"
+            first, second = bucket_numeric(first, second, budget)
+        else:
+            method = "top_n_other"
+            first, second = top_n_other(first, second, budget)
+    elif not _all_numbers(second):
+        method = "stride"
+        first, second = stride(first, second, budget)
+    elif SERIES_METHOD == "minmax":
+        method = "minmax"
+        first, second = minmax(first, second, budget)
+    else:
+        method = "lttb"
+        first, second = lttb(first, second, budget)
+
+    return first, second, {"method": method, "original_points": original, "points": len(first)}
@@ -3,7 +3,8 @@ import json
 import asyncio
 from dotenv import load_dotenv
 import google.generativeai as genai
-from sql_server import SqlReadOnlyServer
+from json_stream import StreamingJSONObjectParser
+from sql_server import get_server
 
 load_dotenv()
 
@@ -11,27 +12,42 @@ load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 model = genai.GenerativeModel("gemini-2.0-flash")
 
-async def run_chat_agent(message: str) -> str:
-    """Handle natural language database queries."""
-    db = SqlReadOnlyServer(os.getenv("DB_PATH"))
-    schema = db.handle_tool("get_schema")
-    
-    prompt = f"""
+def _build_prompt(schema: str, message: str) -> str:
+    return f"""
     Given the database schema:
     {schema}
     
     User question: {message}
     
     Generate a SELECT query to retrieve the requested data and explain the results in plain English. Only generate SQL queries that start with SELECT. Non-SELECT queries (e.g., INSERT, UPDATE, DELETE) are not allowed.
-    Return JSON:
+    Return JSON, with "query" before "explanation":
     {{
         "query": "SELECT ...",
         "explanation": "string"
     }}
     """
+
+def _format_results(data) -> str:
+    text = "\n\nResults:\n"
+    if len(data):
+        for row in data.rows(limit=5):
+            text += ", ".join(f"{k}: {v}" for k, v in zip(data.columns, row)) + "\n"
+    else:
+        text += "No data found."
+    if data.truncated:
+        text += f"\n(Results were cut short by the {data.truncated} budget.)"
+    return text
+
+async def run_chat_agent(message: str) -> str:
+    """Handle natural language database queries."""
+    # Blocking database work runs off the shared event loop so other sessions keep going
+    db = await asyncio.to_thread(get_server, os.getenv("DB_PATH"))
+    schema = await asyncio.to_thread(db.handle_tool, "get_schema", {"question": message})
+    prompt = _build_prompt(schema, message)
     
     try:
-        response = await asyncio.to_thread(model.generate_content, prompt)
+        # Native async call: reuses the client's channel on the long-lived app loop
+        response = await model.generate_content_async(prompt)
         json_str = response.text.strip("```json\n").strip("```")
         print(f"Generated JSON (run_chat_agent): {json_str}")  # Debugging
         result = json.loads(json_str)
@@ -41,27 +57,57 @@ async def run_chat_agent(message: str) -> str:
         
         query = result["query"]
         print(f"Executing query: {query}")  # Debugging
-        query_result = db.handle_tool("read_query", {"query": query})
-        
         try:
-            data = json.loads(query_result)
-            if isinstance(data, dict) and "error" in data:
-                return f"Error executing query: {data['error']} (Query: {query})"
-            if not isinstance(data, list):
-                return f"Error: Query result is not a list of records (Query: {query})."
-        except json.JSONDecodeError:
-            return f"Error: Failed to parse query results (Query: {query})."
-        
-        explanation = f"{result['explanation']}\n\nResults:\n"
-        if data:
-            for row in data[:5]:
-                explanation += ", ".join(f"{k}: {v}" for k, v in row.items()) + "\n"
-        else:
-            explanation += "No data found."
+            data = await asyncio.to_thread(db.run_query, query)
+        except ValueError as e:
+            return f"Error executing query: {str(e)} (Query: {query})"
         
-        return explanation
+        return result["explanation"] + _format_results(data)
     
     except json.JSONDecodeError:
         return "Error: Failed to parse AI response as JSON."
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
+
+async def stream_chat_agent(message: str):
+    """
+    Streaming variant of run_chat_agent: yields the explanation as Gemini
+    produces it, then the results. The query starts running in a worker
+    thread as soon as its JSON field is complete, overlapping with the
+    rest of the generation.
+    """
+    # Blocking database work runs off the shared event loop so other sessions keep going
+    db = await asyncio.to_thread(get_server, os.getenv("DB_PATH"))
+    schema = await asyncio.to_thread(db.handle_tool, "get_schema", {"question": message})
+    prompt = _build_prompt(schema, message)
+    parser = StreamingJSONObjectParser()
+    query = query_task = None
+    explained = False
+    
+    try:
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            for kind, key, value in parser.feed(chunk.text):
+                if kind == "value" and key == "query" and query_task is None:
+                    query = value
+                    print(f"Executing query: {query}")  # Debugging
+                    query_task = asyncio.create_task(asyncio.to_thread(db.run_query, query))
+                elif kind == "delta" and key == "explanation":
+                    explained = True
+                    yield value
+        
+        if query_task is None or not explained:
+            yield "Error: Invalid response format from AI model."
+            return
+        try:
+            data = await query_task
+        except ValueError as e:
+            yield f"\n\nError executing query: {str(e)} (Query: {query})"
+            return
+        yield _format_results(data)
+    
+    except Exception as e:
+        yield f"Error: {str(e)}"
+    finally:
+        if query_task is not None and not query_task.done():
+            query_task.cancel()
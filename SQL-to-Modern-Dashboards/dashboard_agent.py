@@ -1,9 +1,14 @@
 import os
 import json
 import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import google.generativeai as genai
-from sql_server import SqlReadOnlyServer
+from chart_reduction import reduce_chart
+from dashboard_cache import get_dashboard_cache
+from dashboard_renderer import render_dashboard
+from sql_server import QueryResult, SqlReadOnlyServer, get_server
 
 load_dotenv()
 
@@ -11,9 +16,23 @@ load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 model = genai.GenerativeModel("gemini-2.0-flash")
 
-async def analyze_database(message: str, db: SqlReadOnlyServer) -> dict:
+# Metric queries run in parallel on this bounded pool, each worker thread on its own connection
+METRIC_WORKERS = int(os.getenv("METRIC_WORKERS", "4"))
+METRIC_TIMEOUT = float(os.getenv("METRIC_TIMEOUT", "15"))
+_metric_pool = ThreadPoolExecutor(max_workers=METRIC_WORKERS, thread_name_prefix="metric")
+
+async def analyze_database(message: str, db: SqlReadOnlyServer, use_cache: bool = True) -> dict:
     """Analyze database schema and suggest metrics."""
-    schema = db.handle_tool("get_schema")
+    # Only the tables relevant to the request, so large databases fit the prompt
+    schema = await asyncio.to_thread(db.handle_tool, "get_schema", {"question": message})
+    # Keyed on the structural schema so sample values never bust the cache
+    cache = get_dashboard_cache()
+    structure = await asyncio.to_thread(db.handle_tool, "get_schema", {"format": "json"})
+    cache_key = cache.analysis_key(structure, message)
+    if use_cache:
+        cached = cache.get_analysis(cache_key)
+        if cached is not None:
+            return cached
     prompt = f"""
     Given the database schema:
     {schema}
@@ -24,94 +43,146 @@ async def analyze_database(message: str, db: SqlReadOnlyServer) -> dict:
     Return JSON:
     {{
         "domain": "string",
-        "key_metrics": [{{"name": "string", "sql_query": "SELECT ...", "chart_type": "string"}}],
+        "key_metrics": [{{"name": "string", "sql_query": "SELECT ...", "chart_type": "bar|pie|scatter|line"}}],
         "dashboard_components": ["string"]
     }}
     """
     try:
-        response = await asyncio.to_thread(model.generate_content, prompt)
+        # Native async call: reuses the client's channel on the long-lived app loop
+        response = await model.generate_content_async(prompt)
         json_str = response.text.strip("```json\n").strip("```")
         print(f"Generated JSON (analyze_database): {json_str}")  # Debugging
-        return json.loads(json_str)
+        analysis = json.loads(json_str)
     except json.JSONDecodeError:
         raise ValueError("Failed to parse AI response as JSON.")
     except Exception as e:
         raise ValueError(f"Error in schema analysis: {str(e)}")
+    cache.put_analysis(cache_key, message, analysis)
+    return analysis
 
-async def get_data_from_database(analysis: dict, db: SqlReadOnlyServer) -> dict:
-    """Fetch data based on analysis."""
-    data = {"metrics": []}
-    for metric in analysis["key_metrics"]:
-        query = metric["sql_query"]
-        print(f"Executing query: {query}")  # Debugging
+def _run_metric_query(db: SqlReadOnlyServer, query: str, running: list) -> QueryResult:
+    """Worker side of a metric: exposes its connection and thread so a timeout can interrupt it."""
+    worker = (db.current_connection(), threading.get_ident())
+    running.append(worker)
+    try:
+        return db.run_query(query, use_rollups=True)
+    finally:
+        running.remove(worker)
+
+async def _fetch_metric(metric: dict, db: SqlReadOnlyServer, slots: asyncio.Semaphore, data_version: int) -> dict:
+    query = metric["sql_query"]
+    cache = get_dashboard_cache()
+    db_key = os.path.realpath(db.db_path)
+    results = cache.get_metric(db_key, query, data_version)
+    if results is not None:
+        return {
+            "name": metric["name"],
+            "chart_type": metric["chart_type"],
+            "data": results,
+            "max_points": metric.get("max_points"),
+            "cached": True
+        }
+
+    print(f"Executing query: {query}")  # Debugging
+    running = []
+    async with slots:
+        # Semaphore keeps queued metrics off the clock; the timeout covers execution only
+        future = asyncio.get_running_loop().run_in_executor(_metric_pool, _run_metric_query, db, query, running)
         try:
-            results = json.loads(db.handle_tool("read_query", {"query": query}))
-            if isinstance(results, dict) and "error" in results:
-                raise ValueError(f"Query error: {results['error']} (Query: {query})")
-            data["metrics"].append({
-                "name": metric["name"],
-                "chart_type": metric["chart_type"],
-                "data": results
-            })
-        except json.JSONDecodeError:
-            raise ValueError(f"Failed to parse query results for: {query}")
+            results = await asyncio.wait_for(future, METRIC_TIMEOUT)
+        except asyncio.TimeoutError:
+            for conn, thread_id in list(running):
+                conn.interrupt()
+                if db.rollups is not None:
+                    # The worker may still be building the rollup for this query
+                    db.rollups.interrupt(thread_id)
+            raise ValueError(f"Query timed out after {METRIC_TIMEOUT:g}s (Query: {query})")
         except ValueError as e:
-            raise ValueError(f"{str(e)} (Query: {query})")
+            raise ValueError(f"Query error: {str(e)} (Query: {query})")
+    # Tagged with the version read before running, so a concurrent write makes it stale.
+    # Timed-out results depend on load, so they are never reused.
+    if results.truncated != "timeout":
+        cache.put_metric(db_key, query, data_version, results)
+    return {
+        "name": metric["name"],
+        "chart_type": metric["chart_type"],
+        "data": results,
+        "max_points": metric.get("max_points"),
+        "cached": False
+    }
+
+async def get_data_from_database(analysis: dict, db: SqlReadOnlyServer) -> dict:
+    """
+    Fetch data for every metric concurrently. Results cached at the current
+    data_version are reused, so only stale metrics are re-run. A metric that
+    fails or times out is dropped (and listed under "errors") instead of
+    failing the dashboard.
+    """
+    slots = asyncio.Semaphore(METRIC_WORKERS)
+    data_version = await asyncio.to_thread(db.data_version)
+    outcomes = await asyncio.gather(
+        *(_fetch_metric(metric, db, slots, data_version) for metric in analysis["key_metrics"]),
+        return_exceptions=True
+    )
+    data = {"metrics": [], "errors": []}
+    for metric, outcome in zip(analysis["key_metrics"], outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Dropping metric {metric['name']!r}: {outcome}")  # Debugging
+            data["errors"].append({"name": metric["name"], "error": str(outcome)})
+        else:
+            data["metrics"].append(outcome)
+    if analysis["key_metrics"] and not data["metrics"]:
+        raise ValueError("All metric queries failed: " + "; ".join(e["error"] for e in data["errors"]))
     return data
 
-async def generate_html_dashboard(data: dict) -> str:
+async def generate_html_dashboard(data: dict, inline_plotly: bool = None) -> str:
     """Generate HTML dashboard with chart data for Plotly."""
     charts = []
     for idx, metric in enumerate(data["metrics"]):
         chart_type = metric["chart_type"].lower()
         results = metric["data"]
-        if not results:
+        # First column is the category/x axis, second the value
+        if not len(results) or len(results.columns) < 2:
             continue
+        if chart_type not in ("bar", "pie", "scatter", "line"):
+            continue
+        first, second, reduction = reduce_chart(
+            chart_type, results.data[0], results.data[1], metric.get("max_points")
+        )
+        chart = {
+            "id": f"chart{idx + 1}",
+            "title": metric["name"],
+            "type": chart_type
+        }
+        if chart_type == "pie":
+            chart.update(labels=first, values=second)
+        elif chart_type == "line":
+            # Plotly draws lines as scatter traces
+            chart.update(type="scatter", mode="lines", x=first, y=second)
+        else:
+            chart.update(x=first, y=second)
+        if reduction:
+            chart["reduction"] = reduction
+        if results.truncated:
+            chart["truncated"] = results.truncated
+        charts.append(chart)
 
-        if chart_type == "bar":
-            x = [row[list(row.keys())[0]] for row in results]
-            y = [row[list(row.keys())[1]] for row in results]
-            charts.append({
-                "id": f"chart{idx + 1}",
-                "title": metric["name"],
-                "type": "bar",
-                "x": x,
-                "y": y
-            })
-        elif chart_type == "pie":
-            labels = [row[list(row.keys())[0]] for row in results]
-            values = [row[list(row.keys())[1]] for row in results]
-            charts.append({
-                "id": f"chart{idx + 1}",
-                "title": metric["name"],
-                "type": "pie",
-                "labels": labels,
-                "values": values
-            })
-        elif chart_type == "scatter":
-            x = [row[list(row.keys())[0]] for row in results]
-            y = [row[list(row.keys())[1]] for row in results]
-            charts.append({
-                "id": f"chart{idx + 1}",
-                "title": metric["name"],
-                "type": "scatter",
-                "x": x,
-                "y": y
-            })
-
-    with open("templates/dashboard.html", "r") as file:
-        template = file.read()
+    return render_dashboard(charts, inline_plotly)
 
-    charts_json = json.dumps(charts, indent=2)
-    html_content = template.replace('const charts = [];', f'const charts = {charts_json};')
-    return html_content
+async def run_dashboard_agent(message: str, mode: str = "cached") -> str:
+    """
+    Main dashboard generation pipeline.
 
-async def run_dashboard_agent(message: str) -> str:
-    """Main dashboard generation pipeline."""
-    db = SqlReadOnlyServer(os.getenv("DB_PATH"))
+    mode "cached" reuses the analysis for an unchanged schema and request,
+    "refresh" keeps the last analysis for the request and only re-runs
+    stale metrics, "regenerate" asks Gemini for a fresh analysis.
+    """
+    db = await asyncio.to_thread(get_server, os.getenv("DB_PATH"))
     
     try:
-        analysis = await analyze_database(message, db)
+        analysis = get_dashboard_cache().latest_analysis(message) if mode == "refresh" else None
+        if analysis is None:
+            analysis = await analyze_database(message, db, use_cache=mode != "regenerate")
         data = await get_data_from_database(analysis, db)
         html = await generate_html_dashboard(data)
         return html
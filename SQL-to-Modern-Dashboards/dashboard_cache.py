@@ -0,0 +1,96 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+MAX_ANALYSES = int(os.getenv("DASHBOARD_CACHE_ANALYSES", "32"))
+MAX_METRICS = int(os.getenv("DASHBOARD_CACHE_METRICS", "256"))
+
+
+def normalize_sql(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+
+class DashboardCache:
+    """
+    Two-level cache for dashboard generation.
+
+    Level 1 holds Gemini's analysis JSON keyed by a hash of the schema and
+    the request text. Level 2 holds metric results keyed by database and
+    SQL, each tagged with the PRAGMA data_version it was read at; an entry
+    is only served while the database's data_version is unchanged.
+    """
+
+    def __init__(self, max_analyses: int = MAX_ANALYSES, max_metrics: int = MAX_METRICS):
+        self.max_analyses = max_analyses
+        self.max_metrics = max_metrics
+        self._analyses = OrderedDict()
+        self._latest = {}
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"analysis_hits": 0, "analysis_misses": 0, "metric_hits": 0, "metric_misses": 0}
+
+    @staticmethod
+    def analysis_key(schema: str, message: str) -> str:
+        return hashlib.sha256(f"{schema}\0{message.strip()}".encode("utf-8")).hexdigest()
+
+    def get_analysis(self, key: str):
+        with self._lock:
+            analysis = self._analyses.get(key)
+            if analysis is None:
+                self._counts["analysis_misses"] += 1
+                return None
+            self._analyses.move_to_end(key)
+            self._counts["analysis_hits"] += 1
+            return analysis
+
+    def put_analysis(self, key: str, message: str, analysis: dict):
+        with self._lock:
+            self._analyses[key] = analysis
+            self._analyses.move_to_end(key)
+            self._latest[message.strip()] = analysis
+            while len(self._analyses) > self.max_analyses:
+                _, evicted = self._analyses.popitem(last=False)
+                self._latest = {m: a for m, a in self._latest.items() if a is not evicted}
+
+    def latest_analysis(self, message: str):
+        """Most recent analysis for a request, whatever schema it was made for."""
+        with self._lock:
+            return self._latest.get(message.strip())
+
+    def get_metric(self, db_key: str, query: str, data_version: int):
+        key = (db_key, normalize_sql(query))
+        with self._lock:
+            entry = self._metrics.get(key)
+            if entry is None or entry[0] != data_version:
+                self._counts["metric_misses"] += 1
+                return None
+            self._metrics.move_to_end(key)
+            self._counts["metric_hits"] += 1
+            return entry[1]
+
+    def put_metric(self, db_key: str, query: str, data_version: int, result):
+        key = (db_key, normalize_sql(query))
+        with self._lock:
+            self._metrics[key] = (data_version, result)
+            self._metrics.move_to_end(key)
+            while len(self._metrics) > self.max_metrics:
+                self._metrics.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._analyses.clear()
+            self._latest.clear()
+            self._metrics.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"analyses": len(self._analyses), "metrics": len(self._metrics), **self._counts}
+
+
+_cache = DashboardCache()
+
+
+def get_dashboard_cache() -> DashboardCache:
+    return _cache
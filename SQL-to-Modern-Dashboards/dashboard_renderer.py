@@ -0,0 +1,84 @@
+import base64
+import json
+import os
+import sys
+import threading
+from array import array
+from numbers import Real
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "dashboard.html")
+CHARTS_PLACEHOLDER = "const charts = [];"
+# Typed arrays ({dtype, bdata}) need plotly.js >= 2.28, so the CDN build is pinned
+PLOTLY_CDN_TAG = '<script src="https://cdn.plot.ly/plotly-2.35.2.min.js"></script>'
+# Inline the plotly.js bundled with the plotly package instead of loading the CDN
+PLOTLY_INLINE = os.getenv("PLOTLY_INLINE", "").lower() in ("1", "true", "yes")
+# Shorter numeric series stay plain JSON; base64 only pays off past a few dozen values
+TYPED_ARRAY_MIN_LENGTH = 32
+
+_ARRAY_KEYS = ("x", "y", "labels", "values")
+_INT32 = (-2 ** 31, 2 ** 31 - 1)
+
+# (template path, mtime, inline) -> (head, tail), split around the charts placeholder
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def encode_typed_array(values: list):
+    """
+    Encode a numeric list as a plotly.js typed array spec, {"dtype", "bdata"},
+    using int32 when every value fits and float64 otherwise. Lists that are
+    short or hold non-numeric values are returned unchanged.
+    """
+    if len(values) < TYPED_ARRAY_MIN_LENGTH:
+        return values
+    if not all(isinstance(v, Real) and not isinstance(v, bool) for v in values):
+        return values
+    if all(isinstance(v, int) for v in values) and _INT32[0] <= min(values) and max(values) <= _INT32[1]:
+        dtype, packed = "i4", array("i", values)
+    else:
+        dtype, packed = "f8", array("d", values)
+    if sys.byteorder == "big":
+        packed.byteswap()  # plotly.js reads little-endian
+    return {"dtype": dtype, "bdata": base64.b64encode(packed.tobytes()).decode("ascii")}
+
+
+def _plotly_script() -> str:
+    from plotly.offline import get_plotlyjs
+    return f"<script>{get_plotlyjs()}</script>"
+
+
+def _compile(path: str, inline: bool):
+    with open(path, "r") as file:
+        template = file.read()
+    if inline:
+        template = template.replace(PLOTLY_CDN_TAG, _plotly_script())
+    head, sep, tail = template.partition(CHARTS_PLACEHOLDER)
+    if not sep:
+        raise ValueError(f"Template {path} has no '{CHARTS_PLACEHOLDER}' placeholder")
+    return head, tail
+
+
+def compiled_template(path: str = TEMPLATE_PATH, inline: bool = PLOTLY_INLINE):
+    """Template split around the charts placeholder, re-read only when the file changes."""
+    key = (path, os.stat(path).st_mtime_ns, inline)
+    with _compiled_lock:
+        parts = _compiled.get(key)
+    if parts is None:
+        parts = _compile(path, inline)
+        with _compiled_lock:
+            _compiled.clear()
+            _compiled[key] = parts
+    return parts
+
+
+def render_dashboard(charts: list, inline_plotly: bool = None) -> str:
+    """Render chart specs into the dashboard page with compact, typed-array JSON."""
+    inline = PLOTLY_INLINE if inline_plotly is None else inline_plotly
+    head, tail = compiled_template(inline=inline)
+    payload = [
+        {k: encode_typed_array(v) if k in _ARRAY_KEYS else v for k, v in chart.items()}
+        for chart in charts
+    ]
+    # "</" is escaped so chart titles or labels cannot close the script tag
+    charts_json = json.dumps(payload, separators=(",", ":")).replace("</", "<\\/")
+    return f"{head}const charts = {charts_json};{tail}"
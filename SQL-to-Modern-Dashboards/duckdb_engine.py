@@ -0,0 +1,186 @@
+import os
+import re
+import threading
+
+import duckdb
+
+from sql_server import QueryResult
+
+# Rows per Arrow record batch pulled from DuckDB
+BATCH_ROWS = 8192
+FILE_READERS = {".parquet": "read_parquet", ".csv": "read_csv_auto"}
+DUCKDB_SUFFIXES = (".duckdb", ".ddb")
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _view_name(path: str) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"\W", "_", stem) or "data"
+
+
+def _sqlite_compatible(table):
+    """
+    Cast DECIMAL to float and dates/times to ISO text, matching what sqlite3
+    returns, so results stay JSON-serializable and chartable as before.
+    """
+    import pyarrow as pa
+
+    columns = []
+    for column in table.columns:
+        if pa.types.is_decimal(column.type):
+            column = column.cast(pa.float64())
+        elif pa.types.is_date(column.type) or pa.types.is_timestamp(column.type) or pa.types.is_time(column.type):
+            column = column.cast(pa.string())
+        columns.append(column)
+    return pa.Table.from_arrays(columns, names=table.column_names)
+
+
+class DuckDBEngine:
+    """
+    Vectorized DuckDB backend for SqlReadOnlyServer.
+
+    The source can be the same SQLite file (attached read-only through
+    DuckDB's sqlite extension), a DuckDB file, a Parquet/CSV file or a
+    directory of them (one view per file). After setup, file system access
+    is restricted to the source, so generated SQL cannot read other files.
+    Each thread queries through its own cursor; results come back as Arrow.
+    """
+
+    def __init__(self, source: str):
+        self.source = os.path.abspath(source)
+        self.files = self._source_files()
+        self._conn = duckdb.connect(":memory:")
+        self._local = threading.local()
+        self._cursors = []
+        self._lock = threading.Lock()
+        self._setup()
+
+    def _source_files(self) -> list:
+        if os.path.isdir(self.source):
+            return sorted(
+                os.path.join(self.source, name) for name in os.listdir(self.source)
+                if os.path.splitext(name)[1].lower() in FILE_READERS
+            )
+        return [self.source]
+
+    @property
+    def is_sqlite(self) -> bool:
+        suffix = os.path.splitext(self.source)[1].lower()
+        return not os.path.isdir(self.source) and suffix not in FILE_READERS and suffix not in DUCKDB_SUFFIXES
+
+    def _setup(self):
+        conn = self._conn
+        suffix = os.path.splitext(self.source)[1].lower()
+        if os.path.isdir(self.source) or suffix in FILE_READERS:
+            for path in self.files:
+                reader = FILE_READERS[os.path.splitext(path)[1].lower()]
+                conn.execute(f"CREATE VIEW {_quote(_view_name(path))} AS SELECT * FROM {reader}({_literal(path)})")
+        else:
+            if self.is_sqlite:
+                conn.execute("LOAD sqlite")
+                conn.execute(f"ATTACH {_literal(self.source)} AS src (TYPE SQLITE, READ_ONLY)")
+            else:
+                conn.execute(f"ATTACH {_literal(self.source)} AS src (READ_ONLY)")
+            conn.execute("USE src")
+        conn.execute(f"SET allowed_paths = [{', '.join(_literal(p) for p in self.files)}]")
+        conn.execute("SET enable_external_access = false")
+        conn.execute("SET lock_configuration = true")
+
+    def cursor(self):
+        """This thread's cursor; interrupt() on it cancels the running query."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._local.cursor = self._conn.cursor()
+            with self._lock:
+                self._cursors.append(cursor)
+        return cursor
+
+    def execute(self, query: str, timeout: float, max_rows: int, max_bytes: int) -> QueryResult:
+        """Run one SELECT within the given budgets, returning an Arrow-backed QueryResult."""
+        import pyarrow as pa
+
+        cursor = self.cursor()
+        try:
+            statements = cursor.extract_statements(query)
+        except duckdb.Error as e:
+            raise ValueError(f"Error executing query: {str(e)}")
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise ValueError("Only single SELECT queries are allowed")
+
+        timer = threading.Timer(timeout, cursor.interrupt)
+        timer.start()
+        batches, rows, size, truncated, schema = [], 0, 0, None, None
+        try:
+            reader = cursor.execute(query).fetch_record_batch(BATCH_ROWS)
+            schema = reader.schema
+            for batch in reader:
+                if rows + batch.num_rows > max_rows:
+                    batch, truncated = batch.slice(0, max_rows - rows), "max_rows"
+                if size + batch.nbytes > max_bytes:
+                    # Keep the rows of this batch that still fit, at its average row size
+                    fit = (max_bytes - size) * batch.num_rows // max(batch.nbytes, 1)
+                    batch, truncated = batch.slice(0, fit), "max_bytes"
+                batches.append(batch)
+                rows += batch.num_rows
+                size += batch.nbytes
+                if truncated:
+                    break
+        except duckdb.InterruptException:
+            if schema is None:
+                raise ValueError(f"Query exceeded the {timeout:g}s time budget")
+            truncated = "timeout"
+        except duckdb.Error as e:
+            raise ValueError(f"Error executing query: {str(e)}")
+        finally:
+            timer.cancel()
+        return QueryResult.from_arrow(_sqlite_compatible(pa.Table.from_batches(batches, schema=schema)), truncated)
+
+    def schema_version(self):
+        """Changes when a source file is replaced or modified."""
+        return tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in self.files)
+
+    data_version = schema_version
+
+    def introspect(self, sample_values: int, sample_scan: int) -> dict:
+        """Schema snapshot in the same shape as SqlReadOnlyServer._introspect."""
+        cursor = self.cursor()
+        rows = cursor.execute(
+            "SELECT table_name, column_name, data_type, is_nullable, column_default "
+            "FROM information_schema.columns "
+            "WHERE table_catalog = current_database() AND table_schema = current_schema() "
+            "ORDER BY table_name, ordinal_position"
+        ).fetchall()
+        snapshot = {}
+        for table, column, data_type, nullable, default in rows:
+            info = snapshot.setdefault(table, {"columns": [], "foreign_keys": [], "samples": {}})
+            info["columns"].append({
+                "column_name": column,
+                "data_type": data_type,
+                "is_nullable": nullable,
+                "default_value": default,
+                "primary_key": 0
+            })
+            if sample_values > 0 and data_type == "VARCHAR":
+                name = _quote(column)
+                values = [row[0] for row in cursor.execute(
+                    f"SELECT DISTINCT {name} FROM (SELECT {name} FROM {_quote(table)} LIMIT {int(sample_scan)}) "
+                    f"WHERE {name} IS NOT NULL LIMIT {int(sample_values)}"
+                ).fetchall()]
+                if values:
+                    info["samples"][column] = values
+        return snapshot
+
+    def close(self):
+        with self._lock:
+            cursors, self._cursors = self._cursors, []
+        for cursor in cursors:
+            cursor.close()
+        self._conn.close()
+        self._local = threading.local()
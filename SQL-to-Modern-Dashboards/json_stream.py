@@ -0,0 +1,142 @@
+import json
+
+
+def _decode(raw: str) -> str:
+    return json.loads(f'"{raw}"')
+
+
+def _complete_prefix(raw: str) -> str:
+    """The longest prefix of escaped string content that ends on a whole character."""
+    i, n, good = 0, len(raw), 0
+    while i < n:
+        if raw[i] != "\\":
+            i += 1
+        elif i + 1 >= n:
+            break
+        elif raw[i + 1] != "u":
+            i += 2
+        elif i + 6 > n:
+            break
+        else:
+            # A high surrogate needs its \uXXXX partner before it can be decoded
+            high = raw[i + 2:i + 4].lower() in ("d8", "d9", "da", "db")
+            if high and i + 12 > n:
+                break
+            i += 12 if high else 6
+        good = i
+    return raw[:good]
+
+
+class StreamingJSONObjectParser:
+    """
+    Incremental parser for a single flat JSON object arriving in chunks,
+    e.g. Gemini's {"query": ..., "explanation": ...} answer.
+
+    feed() returns events as soon as they can be known:
+      ("delta", key, text)  - more characters of a string value
+      ("value", key, value) - a top-level value is complete
+    Anything before the opening brace (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self._state = "start"
+        self._key = None
+        self._raw = []           # raw (still escaped) characters of the current token
+        self._emitted = 0        # decoded characters already sent as deltas
+        self._escaped = False
+        self._depth = 0          # nesting inside a non-string value
+        self._in_nested_string = False
+        self.done = False
+
+    def _flush_delta(self, events: list, final: bool = False):
+        raw = "".join(self._raw)
+        try:
+            text = _decode(raw if final else _complete_prefix(raw))
+        except json.JSONDecodeError:
+            return
+        if len(text) > self._emitted:
+            events.append(("delta", self._key, text[self._emitted:]))
+            self._emitted = len(text)
+
+    def feed(self, chunk: str) -> list:
+        events = []
+        for ch in chunk:
+            state = self._state
+            if state == "start":
+                if ch == "{":
+                    self._state = "key_or_end"
+            elif state in ("key_or_end", "key"):
+                if ch == '"':
+                    self._state, self._raw, self._escaped = "in_key", [], False
+                elif ch == "}" and state == "key_or_end":
+                    self._state, self.done = "end", True
+            elif state == "in_key":
+                if self._escaped:
+                    self._escaped = False
+                    self._raw.append(ch)
+                elif ch == "\\":
+                    self._escaped = True
+                    self._raw.append(ch)
+                elif ch == '"':
+                    self._key = _decode("".join(self._raw))
+                    self._state = "colon"
+                else:
+                    self._raw.append(ch)
+            elif state == "colon":
+                if ch == ":":
+                    self._state = "value"
+            elif state == "value":
+                if ch == '"':
+                    self._state, self._raw, self._emitted, self._escaped = "in_string", [], 0, False
+                elif not ch.isspace():
+                    self._state, self._raw, self._depth, self._in_nested_string = "in_other", [ch], 0, False
+                    self._escaped = False
+                    if ch in "[{":
+                        self._depth = 1
+            elif state == "in_string":
+                if self._escaped:
+                    self._escaped = False
+                    self._raw.append(ch)
+                elif ch == "\\":
+                    self._escaped = True
+                    self._raw.append(ch)
+                elif ch == '"':
+                    self._flush_delta(events, final=True)
+                    events.append(("value", self._key, _decode("".join(self._raw))))
+                    self._state = "after_value"
+                else:
+                    self._raw.append(ch)
+            elif state == "in_other":
+                # Numbers, literals and nested containers: collect until the value ends
+                if self._in_nested_string:
+                    self._raw.append(ch)
+                    if self._escaped:
+                        self._escaped = False
+                    elif ch == "\\":
+                        self._escaped = True
+                    elif ch == '"':
+                        self._in_nested_string = False
+                    continue
+                if self._depth == 0 and (ch in ",}" or ch.isspace()):
+                    events.append(("value", self._key, json.loads("".join(self._raw))))
+                    self._state = "after_value"
+                    if ch == ",":
+                        self._state = "key"
+                    elif ch == "}":
+                        self._state, self.done = "end", True
+                    continue
+                self._raw.append(ch)
+                if ch == '"':
+                    self._in_nested_string = True
+                elif ch in "[{":
+                    self._depth += 1
+                elif ch in "]}":
+                    self._depth -= 1
+            elif state == "after_value":
+                if ch == ",":
+                    self._state = "key"
+                elif ch == "}":
+                    self._state, self.done = "end", True
+        if self._state == "in_string":
+            self._flush_delta(events)
+        return events
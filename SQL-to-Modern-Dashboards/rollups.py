@@ -0,0 +1,492 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Schema name the rollup sidecar is attached under on reader connections
+ROLLUP_SCHEMA = "rollups"
+# A GROUP BY shape is materialized once it has been asked for this many times
+ROLLUP_MIN_HITS = int(os.getenv("ROLLUP_MIN_HITS", "2"))
+# Full rebuild interval; incremental refreshes only see appended rows
+ROLLUP_MAX_AGE = float(os.getenv("ROLLUP_MAX_AGE", "3600"))
+# Rollups with more groups than this fraction of source rows save nothing and are dropped
+ROLLUP_MAX_GROUP_RATIO = 0.1
+# Source tables known to be insert-only (e.g. event logs), comma-separated. Only these
+# are refreshed incrementally; any other change to the source forces a full rebuild,
+# since in-place UPDATEs cannot be detected from the read-only attachment.
+ROLLUP_APPEND_ONLY = {
+    name.strip().lower() for name in os.getenv("ROLLUP_APPEND_ONLY_TABLES", "").split(",") if name.strip()
+}
+# VM instructions between deadline checks while building or refreshing a rollup
+ROLLUP_PROGRESS_STEPS = 10000
+# Seconds to wait for another thread's rollup work before answering from the source instead
+ROLLUP_LOCK_WAIT = 0.05
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<str>'(?:[^']|'')*')
+  | (?P<qid>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+  | (?P<num>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+  | (?P<id>[A-Za-z_][\w$]*)
+  | (?P<op><=|>=|<>|!=|==|\|\||[-+*/%<>=(),.;])
+""", re.X | re.S)
+
+_AGGREGATES = {"sum", "total", "count", "avg", "min", "max"}
+# Identifiers allowed around aggregates in SELECT, HAVING and ORDER BY
+_KEYWORDS = {
+    "round", "abs", "coalesce", "ifnull", "nullif", "cast", "as", "real", "integer", "numeric", "text",
+    "asc", "desc", "nulls", "first", "last", "and", "or", "not", "is", "null", "in", "between", "like",
+}
+_CLAUSES = ("from", "group", "having", "order", "limit")
+
+
+def _tokenize(sql: str):
+    """[(kind, text, start, end)] without whitespace/comments, or None if anything is unrecognised."""
+    tokens, pos = [], 0
+    while pos < len(sql):
+        match = _TOKEN_RE.match(sql, pos)
+        if not match:
+            return None
+        if match.lastgroup != "ws":
+            tokens.append((match.lastgroup, match.group(), match.start(), match.end()))
+        pos = match.end()
+    while tokens and tokens[-1][1] == ";":
+        tokens.pop()
+    return tokens
+
+
+def _name(token) -> str:
+    """Case-folded identifier name, quotes removed."""
+    kind, text = token[0], token[1]
+    if kind == "qid":
+        return text[1:-1].replace('""', '"').lower()
+    return text.lower()
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _split(tokens, sep=","):
+    """Split on top-level separators."""
+    parts, current, depth = [], [], 0
+    for token in tokens:
+        if token[1] == "(":
+            depth += 1
+        elif token[1] == ")":
+            depth -= 1
+        if depth == 0 and token[1] == sep:
+            parts.append(current)
+            current = []
+        else:
+            current.append(token)
+    parts.append(current)
+    return parts
+
+
+def _is_ident(token) -> bool:
+    return token[0] in ("id", "qid")
+
+
+class RollupQuery:
+    """A recognised `SELECT groups, aggregates FROM table GROUP BY groups ...` query."""
+
+    def __init__(self, table, groups, measures, select, having, order, limit):
+        self.table = table
+        self.groups = groups          # group column names, in GROUP BY order
+        self.measures = measures      # {(func, column)} needed from the rollup
+        self.select = select          # [(kind, tokens, alias, original_text)]
+        self.having = having
+        self.order = order
+        self.limit = limit
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha1(json.dumps([self.table, self.groups]).encode()).hexdigest()[:12]
+
+
+def parse_rollup_query(sql: str, columns: dict):
+    """
+    Recognise a single-table GROUP BY over plain columns whose other outputs
+    are only SUM/TOTAL/COUNT/AVG/MIN/MAX of plain columns (optionally inside
+    ROUND/ABS/COALESCE/CAST arithmetic). `columns` maps table name to its
+    set of column names. Returns a RollupQuery or None.
+    """
+    tokens = _tokenize(sql)
+    if not tokens or _name(tokens[0]) != "select":
+        return None
+
+    # Cut the statement into clauses at top-level keywords
+    clauses, current, depth = {"select": []}, "select", 0
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        if token[1] == "(":
+            depth += 1
+        elif token[1] == ")":
+            depth -= 1
+        name = _name(token) if token[0] == "id" else None
+        if depth == 0 and name in ("where", "join", "union", "intersect", "except", "window", "distinct", "all"):
+            return None
+        if depth == 0 and name in _CLAUSES:
+            if name in ("group", "order"):
+                if i + 1 >= len(tokens) or _name(tokens[i + 1]) != "by":
+                    return None
+                i += 1
+            if name in clauses:
+                return None
+            clauses[name], current = [], name
+        else:
+            clauses[current].append(token)
+        i += 1
+
+    source = clauses.get("from")
+    if not source or len(source) != 1 or not _is_ident(source[0]) or "group" not in clauses:
+        return None
+    table = _name(source[0])
+    table_columns = columns.get(table)
+    if not table_columns:
+        return None
+
+    groups = []
+    for item in _split(clauses["group"]):
+        if len(item) != 1 or not _is_ident(item[0]) or _name(item[0]) not in table_columns:
+            return None
+        groups.append(_name(item[0]))
+
+    measures = set()
+
+    def substitute(item):
+        """Replace aggregate calls with ("measure", (func, column)) tokens."""
+        out, j = [], 0
+        while j < len(item):
+            token = item[j]
+            if (token[0] == "id" and _name(token) in _AGGREGATES and j + 3 < len(item)
+                    and item[j + 1][1] == "(" and item[j + 3][1] == ")"):
+                func, arg = _name(token), item[j + 2]
+                if arg[1] == "*" and func == "count":
+                    column = "*"
+                elif _is_ident(arg) and _name(arg) in table_columns:
+                    column = _name(arg)
+                else:
+                    return None
+                for needed in {"avg": ("sum", "count"), "total": ("sum",)}.get(func, (func,)):
+                    measures.add((needed, column))
+                out.append(("measure", (func, column)))
+                j += 4
+                continue
+            out.append(token)
+            j += 1
+        return out
+
+    def allowed(item, extra=()):
+        for token in item:
+            if _is_ident(token) and _name(token) not in _KEYWORDS and _name(token) not in groups \
+                    and _name(token) not in extra:
+                return False
+        return True
+
+    select, aliases = [], set()
+    for item in _split(clauses["select"]):
+        if not item:
+            return None
+        alias = None
+        if len(item) >= 3 and _name(item[-2]) == "as" and _is_ident(item[-1]):
+            alias, item = item[-1], item[:-2]
+        elif len(item) >= 2 and _is_ident(item[-1]) and _name(item[-1]) not in _KEYWORDS \
+                and (item[-2][1] == ")" or _is_ident(item[-2])):
+            alias, item = item[-1], item[:-1]
+        if alias:
+            aliases.add(_name(alias))
+        if len(item) == 1 and _is_ident(item[0]) and _name(item[0]) in groups:
+            select.append(("group", item, alias, None))
+            continue
+        expr = substitute(item)
+        if expr is None or not any(t[0] == "measure" for t in expr) or not allowed(expr):
+            return None
+        # SQLite names an unaliased result column after its source text
+        original = sql[item[0][2]:item[-1][3]]
+        select.append(("measure", expr, alias, original))
+
+    having = order = None
+    if "having" in clauses:
+        having = substitute(clauses["having"])
+        if having is None or not allowed(having, aliases):
+            return None
+        # SQLite binds a HAVING name to a source column before a result alias,
+        # while the rewrite could only bind it to the aggregate
+        if any(_is_ident(t) and _name(t) in aliases and _name(t) in table_columns for t in having):
+            return None
+    if "order" in clauses:
+        order = substitute(clauses["order"])
+        if order is None or not allowed(order, aliases):
+            return None
+    limit = clauses.get("limit")
+    if limit is not None and not all(t[0] == "num" or t[1] == "," or _name(t) == "offset" for t in limit):
+        return None
+
+    measures.add(("count", "*"))
+    return RollupQuery(table, groups, measures, select, having, order, limit)
+
+
+def _source_expr(func: str, column: str) -> str:
+    return f"{func.upper()}({'*' if column == '*' else _quote(column)})"
+
+
+def _merge_expr(func: str, name: str) -> str:
+    # Partial counts and sums add up; min/max of partials is the overall min/max
+    return f"{'SUM' if func in ('sum', 'count') else func.upper()}({name})"
+
+
+class RollupStore:
+    """
+    Materialized GROUP BY rollups kept in a sidecar SQLite file.
+
+    The source database is only ever attached read-only. A rollup holds one
+    row per group with the partial aggregates (sum/count/min/max) needed to
+    answer recurring metric queries; matching queries are rewritten to read
+    from it. When the source's data_version moves, a rollup is rebuilt in
+    full, unless its table is declared append-only: then appended rows (by
+    rowid) are folded in incrementally, deletes trigger a full rebuild, and
+    the rollup is rebuilt after ROLLUP_MAX_AGE in case of in-place updates.
+
+    Builds and refreshes run under the caller's time budget and can be
+    interrupted; a rollup that cannot be brought up to date is not served.
+    """
+
+    def __init__(self, db_path: str, cache_path: str = None, min_hits: int = ROLLUP_MIN_HITS,
+                 max_age: float = ROLLUP_MAX_AGE, append_only: set = None):
+        self.db_path = db_path
+        self.cache_path = cache_path or os.getenv("ROLLUP_DB_PATH") or f"{db_path}.rollups.db"
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.append_only = ROLLUP_APPEND_ONLY if append_only is None else {t.lower() for t in append_only}
+        self._lock = threading.Lock()
+        # Thread currently running rewrite(), so interrupt() only cancels that caller's work
+        self._owner = None
+        self._hits = {}
+        self._rejected = set()
+        self._seen_version = {}
+        self._counts = {"rewrites": 0, "builds": 0, "incremental_refreshes": 0}
+        self._conn = sqlite3.connect(f"file:{os.path.abspath(self.cache_path)}", uri=True, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("ATTACH DATABASE ? AS src", (f"file:{os.path.abspath(db_path)}?mode=ro",))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rollup_meta (name TEXT PRIMARY KEY, source_table TEXT NOT NULL, "
+            "groups TEXT NOT NULL, measures TEXT NOT NULL, last_rowid INTEGER NOT NULL, "
+            "row_count INTEGER NOT NULL, built_at REAL NOT NULL)"
+        )
+        self._columns = None
+        self._columns_version = None
+
+    def _source_columns(self) -> dict:
+        """Column names per rowid table of the source, re-read when its schema changes."""
+        version = self._conn.execute("PRAGMA src.schema_version").fetchone()[0]
+        if version != self._columns_version:
+            columns = {}
+            tables = self._conn.execute(
+                "SELECT name, sql FROM src.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+            for table, sql in tables:
+                if sql and "WITHOUT ROWID" in sql.upper():
+                    continue
+                info = self._conn.execute(f"PRAGMA src.table_info({_quote(table)})").fetchall()
+                columns[table.lower()] = {row[1].lower() for row in info}
+            self._columns, self._columns_version = columns, version
+        return self._columns
+
+    def _meta(self, name: str):
+        row = self._conn.execute(
+            "SELECT measures, last_rowid, row_count, built_at FROM rollup_meta WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"measures": [tuple(m) for m in json.loads(row[0])], "last_rowid": row[1],
+                "row_count": row[2], "built_at": row[3]}
+
+    def _aggregate_sql(self, parsed: RollupQuery, measures: list, where: str = "") -> str:
+        groups = ", ".join(_quote(g) for g in parsed.groups)
+        aggs = ", ".join(f"{_source_expr(f, c)} AS m{i}" for i, (f, c) in enumerate(measures))
+        return f"SELECT {groups}, {aggs} FROM src.{_quote(parsed.table)} {where} GROUP BY {groups}"
+
+    def _rollback(self):
+        # An interrupted statement may already have ended the transaction,
+        # and the expired deadline must not abort the rollback itself
+        self._conn.set_progress_handler(None, 0)
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def _build(self, name: str, parsed: RollupQuery, measures: list):
+        """Full (re)build of a rollup table from the source."""
+        last_rowid = self._conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM src.{_quote(parsed.table)}").fetchone()[0]
+        rows_index = measures.index(("count", "*"))
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(f"DROP TABLE IF EXISTS {_quote(name)}")
+            self._conn.execute(
+                f"CREATE TABLE {_quote(name)} AS "
+                f"{self._aggregate_sql(parsed, measures, 'WHERE rowid <= ?')}", (last_rowid,)
+            )
+            row_count = self._conn.execute(f"SELECT COALESCE(SUM(m{rows_index}), 0) FROM {_quote(name)}").fetchone()[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rollup_meta VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, parsed.table, json.dumps(parsed.groups), json.dumps(measures), last_rowid, row_count, time.time())
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._rollback()
+            raise
+        self._counts["builds"] += 1
+
+    def _append(self, name: str, parsed: RollupQuery, meta: dict, max_rowid: int):
+        """Fold rows appended since the last refresh into the rollup."""
+        measures = meta["measures"]
+        groups = ", ".join(_quote(g) for g in parsed.groups)
+        merged = ", ".join(_merge_expr(f, f"m{i}") for i, (f, _) in enumerate(measures))
+        rows_index = measures.index(("count", "*"))
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("DROP TABLE IF EXISTS temp.rollup_merge")
+            self._conn.execute(
+                f"CREATE TEMP TABLE rollup_merge AS SELECT {groups}, {merged} FROM ("
+                f"SELECT * FROM main.{_quote(name)} UNION ALL "
+                f"{self._aggregate_sql(parsed, measures, 'WHERE rowid > ? AND rowid <= ?')}"
+                f") GROUP BY {groups}", (meta["last_rowid"], max_rowid)
+            )
+            self._conn.execute(f"DELETE FROM main.{_quote(name)}")
+            self._conn.execute(f"INSERT INTO main.{_quote(name)} SELECT * FROM temp.rollup_merge")
+            self._conn.execute("DROP TABLE temp.rollup_merge")
+            row_count = self._conn.execute(f"SELECT COALESCE(SUM(m{rows_index}), 0) FROM {_quote(name)}").fetchone()[0]
+            self._conn.execute(
+                "UPDATE rollup_meta SET last_rowid = ?, row_count = ? WHERE name = ?", (max_rowid, row_count, name)
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._rollback()
+            raise
+        self._counts["incremental_refreshes"] += 1
+
+    def _ensure_fresh(self, name: str, parsed: RollupQuery, meta: dict, version: int):
+        if time.time() - meta["built_at"] > self.max_age:
+            self._build(name, parsed, meta["measures"])
+            return
+        if self._seen_version.get(name) == version:
+            return
+        if parsed.table.lower() not in self.append_only:
+            # Row counts and rowids cannot rule out an UPDATE, so recompute from scratch
+            self._build(name, parsed, meta["measures"])
+            return
+        table = f"src.{_quote(parsed.table)}"
+        max_rowid = self._conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+        kept = self._conn.execute(f"SELECT COUNT(*) FROM {table} WHERE rowid <= ?", (meta["last_rowid"],)).fetchone()[0]
+        if kept != meta["row_count"]:
+            # Rows were deleted (or replaced) below the watermark
+            self._build(name, parsed, meta["measures"])
+        elif max_rowid > meta["last_rowid"]:
+            self._append(name, parsed, meta, max_rowid)
+
+    def _worthwhile(self, name: str) -> bool:
+        """Drop a freshly built rollup that barely reduces the row count."""
+        groups = self._conn.execute(f"SELECT COUNT(*) FROM {_quote(name)}").fetchone()[0]
+        if groups <= max(self._meta(name)["row_count"] * ROLLUP_MAX_GROUP_RATIO, 1):
+            return True
+        self._conn.execute(f"DROP TABLE {_quote(name)}")
+        self._conn.execute("DELETE FROM rollup_meta WHERE name = ?", (name,))
+        self._rejected.add(name)
+        return False
+
+    def _render(self, name: str, parsed: RollupQuery, measures: list) -> str:
+        index = {m: i for i, m in enumerate(measures)}
+
+        def expr(tokens):
+            parts = []
+            for kind, value, *_ in tokens:
+                if kind != "measure":
+                    parts.append(value)
+                    continue
+                func, column = value
+                if func == "avg":
+                    parts.append(f"(CAST(m{index[('sum', column)]} AS REAL) / NULLIF(m{index[('count', column)]}, 0))")
+                elif func == "total":
+                    parts.append(f"CAST(COALESCE(m{index[('sum', column)]}, 0) AS REAL)")
+                else:
+                    parts.append(f"m{index[(func, column)]}")
+            return " ".join(parts)
+
+        items = []
+        for kind, tokens, alias, original in parsed.select:
+            if kind == "group":
+                items.append(tokens[0][1] + (f" AS {alias[1]}" if alias else ""))
+            else:
+                # Keep the original result column name when it had no alias
+                items.append(f"{expr(tokens)} AS {alias[1] if alias else _quote(original)}")
+        sql = f"SELECT {', '.join(items)} FROM {ROLLUP_SCHEMA}.{_quote(name)}"
+        if parsed.having:
+            sql += f" WHERE {expr(parsed.having)}"
+        if parsed.order:
+            sql += f" ORDER BY {expr(parsed.order)}"
+        if parsed.limit:
+            sql += " LIMIT " + " ".join(t[1] for t in parsed.limit)
+        return sql
+
+    def interrupt(self, thread_id: int):
+        """Cancel a build or refresh running on behalf of the given thread, if any."""
+        if self._owner == thread_id:
+            self._conn.interrupt()
+
+    def rewrite(self, query: str, timeout: float):
+        """
+        Return SQL answering `query` from a rollup (attached as "rollups"),
+        building or refreshing the rollup as needed, or None if the query
+        does not match or has not recurred often enough yet. Raises
+        sqlite3.Error, leaving the rollup unserved, when the work does not
+        finish within `timeout` seconds or is interrupted.
+        """
+        if not self._lock.acquire(timeout=ROLLUP_LOCK_WAIT):
+            return None
+        deadline = time.monotonic() + timeout
+        self._owner = threading.get_ident()
+        # A non-zero return from the progress handler aborts the running statement
+        self._conn.set_progress_handler(lambda: int(time.monotonic() > deadline), ROLLUP_PROGRESS_STEPS)
+        try:
+            return self._rewrite(query)
+        finally:
+            self._conn.set_progress_handler(None, 0)
+            self._owner = None
+            self._lock.release()
+
+    def _rewrite(self, query: str):
+        parsed = parse_rollup_query(query, self._source_columns())
+        if parsed is None:
+            return None
+        name = f"rollup_{parsed.key}"
+        if name in self._rejected:
+            return None
+        self._hits[name] = self._hits.get(name, 0) + 1
+        meta = self._meta(name)
+        if meta is None and self._hits[name] < self.min_hits:
+            return None
+        version = self._conn.execute("PRAGMA src.data_version").fetchone()[0]
+        if meta is None or not parsed.measures <= set(meta["measures"]):
+            measures = sorted(parsed.measures | set(meta["measures"] if meta else ()))
+            self._build(name, parsed, measures)
+            if not self._worthwhile(name):
+                return None
+        else:
+            self._ensure_fresh(name, parsed, meta, version)
+        self._seen_version[name] = version
+        self._counts["rewrites"] += 1
+        return self._render(name, parsed, self._meta(name)["measures"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            rollups = self._conn.execute("SELECT COUNT(*) FROM rollup_meta").fetchone()[0]
+            return {"rollups": rollups, **self._counts}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,134 @@
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+# Tables kept per question before adding foreign-key neighbours; 0 disables pruning
+SCHEMA_TOP_K = int(os.getenv("SCHEMA_TOP_K", "5"))
+# Pruned schemas remembered per index, by question fingerprint
+MAX_PRUNED = 256
+# Term repetitions per field: a table name match outweighs a column, which outweighs a sample value
+FIELD_WEIGHTS = {"table": 3, "column": 2, "sample": 1}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from give how i in is it list me many much "
+    "of on or per show tell the there to what when where which who with".split()
+)
+
+
+def _stem(token: str) -> str:
+    """Fold simple English plurals so 'categories' matches 'category'."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith("sses"):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    """Lowercase terms from identifiers or prose, splitting snake_case and camelCase."""
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(text))
+    return [
+        _stem(token) for token in re.findall(r"[a-z0-9]+", text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+def question_fingerprint(question: str) -> str:
+    """BM25 ranks a bag of terms, so questions with the same terms share a fingerprint."""
+    terms = " ".join(sorted(set(tokenize(question))))
+    return hashlib.sha256(terms.encode("utf-8")).hexdigest()
+
+
+class SchemaIndex:
+    """
+    BM25 index over a schema snapshot, one document per table built from its
+    name, column names and sampled values.
+
+    prune() keeps only the tables relevant to a question: the top_k best
+    matches plus their foreign-key neighbours in both directions, so the
+    model still sees the join paths. Results are cached per question
+    fingerprint. A question that matches nothing gets the full snapshot.
+    """
+
+    def __init__(self, snapshot: dict, max_pruned: int = MAX_PRUNED):
+        self.snapshot = snapshot
+        self.max_pruned = max_pruned
+        self._postings = defaultdict(list)  # term -> [(table, term frequency)]
+        self._lengths = {}
+        self._neighbours = defaultdict(set)
+        self._pruned = OrderedDict()
+        self._lock = threading.Lock()
+
+        for table, info in snapshot.items():
+            terms = Counter()
+            for term in tokenize(table):
+                terms[term] += FIELD_WEIGHTS["table"]
+            for col in info["columns"]:
+                for term in tokenize(col["column_name"]):
+                    terms[term] += FIELD_WEIGHTS["column"]
+            for values in info["samples"].values():
+                for value in values:
+                    for term in tokenize(value):
+                        terms[term] += FIELD_WEIGHTS["sample"]
+            for term, tf in terms.items():
+                self._postings[term].append((table, tf))
+            self._lengths[table] = sum(terms.values())
+            for fk in info["foreign_keys"]:
+                if fk["table"] in snapshot and fk["table"] != table:
+                    self._neighbours[table].add(fk["table"])
+                    self._neighbours[fk["table"]].add(table)
+        self._avg_length = sum(self._lengths.values()) / len(self._lengths) if self._lengths else 0
+
+    def search(self, question: str) -> list:
+        """(table, score) pairs for tables matching the question, best first."""
+        n = len(self._lengths)
+        scores = Counter()
+        for term in set(tokenize(question)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for table, tf in postings:
+                norm = 1 - BM25_B + BM25_B * self._lengths[table] / self._avg_length
+                scores[table] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+        return scores.most_common()
+
+    def select(self, question: str, top_k: int = SCHEMA_TOP_K) -> list:
+        """Names of the tables to keep for a question, in schema order."""
+        if top_k <= 0 or len(self.snapshot) <= top_k:
+            return list(self.snapshot)
+        ranked = self.search(question)
+        if not ranked:
+            return list(self.snapshot)
+        keep = {table for table, _ in ranked[:top_k]}
+        for table in list(keep):
+            keep |= self._neighbours[table]
+        return [table for table in self.snapshot if table in keep]
+
+    def prune(self, question: str, top_k: int = SCHEMA_TOP_K):
+        """
+        (pruned snapshot, rendered text by format) for a question; callers
+        fill the dict with the formats they render, as with the full schema.
+        """
+        key = (question_fingerprint(question), top_k)
+        with self._lock:
+            entry = self._pruned.get(key)
+            if entry is not None:
+                self._pruned.move_to_end(key)
+                return entry
+        tables = self.select(question, top_k)
+        entry = ({table: self.snapshot[table] for table in tables}, {})
+        with self._lock:
+            self._pruned[key] = entry
+            while len(self._pruned) > self.max_pruned:
+                self._pruned.popitem(last=False)
+        return entry
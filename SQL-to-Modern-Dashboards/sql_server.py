@@ -1,69 +1,486 @@
 import sqlite3
 import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from rollups import ROLLUP_SCHEMA, RollupStore
+from schema_index import SCHEMA_TOP_K, SchemaIndex
 
 load_dotenv()
 
+# Distinct example values shown per text column in the compact schema. Off by
+# default: samples are real row data and end up in every Gemini prompt
+SCHEMA_SAMPLE_VALUES = int(os.getenv("SCHEMA_SAMPLE_VALUES", "0"))
+# Rows scanned per column when collecting samples, so big tables stay cheap
+SCHEMA_SAMPLE_SCAN = 1000
+
+# Prepared statements kept per connection by sqlite3
+STATEMENT_CACHE_SIZE = 256
+# Applied to every read-only connection when it is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -32000",  # ~32 MB page cache
+    "PRAGMA mmap_size = 268435456",  # 256 MB memory-mapped reads
+)
+
+# Default per-call budgets for read_query; each can be overridden per call
+QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", "10"))
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "100000"))
+QUERY_MAX_BYTES = int(os.getenv("QUERY_MAX_BYTES", str(64 * 1024 * 1024)))
+# VM instructions between deadline checks, and rows pulled per fetchmany
+PROGRESS_STEPS = 10000
+FETCH_BATCH = 500
+
+# Serve recurring GROUP BY metrics from materialized rollups (see rollups.py)
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "0").lower() in ("1", "true", "yes")
+
+# Query engine: "sqlite" (built-in sqlite3) or "duckdb" (optional, see duckdb_engine.py)
+SQL_ENGINE = os.getenv("SQL_ENGINE", "sqlite").lower()
+# Sources only DuckDB can read; these (and directories of them) always use it
+DUCKDB_SOURCE_SUFFIXES = (".parquet", ".csv", ".duckdb", ".ddb")
+
+# Schema snapshots shared by every server on the same file:
+# realpath -> (schema_version, snapshot, rendered text by format)
+_schema_cache = {}
+_schema_lock = threading.Lock()
+# BM25 indexes for question-pruned schemas: realpath -> (schema_version, SchemaIndex)
+_schema_indexes = {}
+
+# One server per database file for the whole process
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def render_compact_schema(snapshot: dict, samples: bool = True) -> str:
+    """
+    One line per table, e.g.
+    sales(id INTEGER PK, category TEXT NOT NULL e.g. 'Electronics'|'Clothing', ...)
+    """
+    lines = []
+    for table, info in snapshot.items():
+        parts = []
+        for col in info["columns"]:
+            part = f"{col['column_name']} {col['data_type'] or 'ANY'}"
+            if col["primary_key"]:
+                part += " PK"
+            elif col["is_nullable"] == "NO":
+                part += " NOT NULL"
+            values = info["samples"].get(col["column_name"]) if samples else None
+            if values:
+                part += " e.g. " + "|".join(repr(v) for v in values)
+            parts.append(part)
+        line = f"{table}({', '.join(parts)})"
+        if info["foreign_keys"]:
+            line += " FK " + ", ".join(
+                f"{fk['from']}->{fk['table']}.{fk['to']}" for fk in info["foreign_keys"]
+            )
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _row_bytes(row: tuple) -> int:
+    """Rough in-memory size of a row, for the max_bytes budget."""
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in row)
+
+
+class QueryResult:
+    """
+    Columnar query result: column names plus one list of values per column.
+    Used in-process by the agents; records/JSON are only built at the tool boundary.
+    truncated names the budget that cut the result short ("timeout",
+    "max_rows" or "max_bytes"), or is None for a complete result.
+    Results from the DuckDB engine keep their Arrow table in `arrow`; the
+    Python lists in `data` are only built when first accessed.
+    """
+
+    __slots__ = ("columns", "_data", "arrow", "truncated")
+
+    def __init__(self, columns: list, data: list = None, truncated: str = None, arrow=None):
+        self.columns = columns
+        self._data = data
+        self.arrow = arrow
+        self.truncated = truncated
+
+    @classmethod
+    def from_rows(cls, columns: list, rows: list, truncated: str = None) -> "QueryResult":
+        data = [list(values) for values in zip(*rows)] if rows else [[] for _ in columns]
+        return cls(columns, data, truncated)
+
+    @classmethod
+    def from_cursor(cls, cursor) -> "QueryResult":
+        columns = [desc[0] for desc in cursor.description or ()]
+        return cls.from_rows(columns, cursor.fetchall())
+
+    @classmethod
+    def from_arrow(cls, table, truncated: str = None) -> "QueryResult":
+        return cls(list(table.column_names), truncated=truncated, arrow=table)
+
+    @property
+    def data(self) -> list:
+        if self._data is None:
+            self._data = [column.to_pylist() for column in self.arrow.columns]
+        return self._data
+
+    def to_arrow(self):
+        """The result as a pyarrow.Table (requires pyarrow for sqlite3 results)."""
+        if self.arrow is None:
+            import pyarrow as pa
+            self.arrow = pa.Table.from_arrays([pa.array(values) for values in self.data], names=self.columns)
+        return self.arrow
+
+    def __len__(self) -> int:
+        if self.arrow is not None:
+            return self.arrow.num_rows
+        return len(self.data[0]) if self.data else 0
+
+    def column(self, key) -> list:
+        """Values of a column, by position or name."""
+        return self.data[key if isinstance(key, int) else self.columns.index(key)]
+
+    def rows(self, limit: int = None):
+        """Iterate row tuples, optionally only the first `limit`."""
+        columns = self.data if limit is None else [values[:limit] for values in self.data]
+        return zip(*columns)
+
+    def to_records(self) -> list[dict]:
+        return [dict(zip(self.columns, row)) for row in self.rows()]
+
+
 class SqlReadOnlyServer:
-    def __init__(self, db_path: str):
+    """
+    Read-only tool server over a SQLite file.
+
+    Each thread gets its own long-lived connection opened through a
+    mode=ro URI, so the server can be shared by concurrent threads and by
+    asyncio tasks (which run on the loop thread one call at a time).
+
+    With engine="duckdb", queries run on DuckDB instead: either over the
+    same SQLite file or over Parquet/CSV/DuckDB sources, which sqlite3
+    cannot open. The tool interface and QueryResult stay the same.
+    """
+
+    def __init__(self, db_path: str, engine: str = None):
         self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # PRAGMA data_version is only comparable on one connection, so keep a dedicated one
+        self._sentinel = None
+        self._sentinel_lock = threading.Lock()
+        self.rollups = None
+        self.engine = self._open_engine((engine or SQL_ENGINE).lower())
 
-    def _get_schema(self) -> str:
-        """Retrieve database schema as JSON."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        schema = {}
+    def _open_engine(self, engine: str):
+        """The DuckDB engine when requested or required by the source, else None for sqlite3."""
+        required = os.path.isdir(self.db_path) or os.path.splitext(self.db_path)[1].lower() in DUCKDB_SOURCE_SUFFIXES
+        if engine not in ("sqlite", "duckdb"):
+            raise ValueError(f"Unknown SQL engine: {engine}")
+        if engine == "sqlite" and not required:
+            return None
         try:
-            # Get table names
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            for table in tables:
-                cursor.execute(f"PRAGMA table_info({table});")
-                columns = [
-                    {
-                        "column_name": row[1],
-                        "data_type": row[2],
-                        "is_nullable": "YES" if row[3] == 0 else "NO",
-                        "default_value": row[4],
-                        "primary_key": row[5]
-                    }
-                    for row in cursor.fetchall()
-                ]
-                schema[table] = columns
+            from duckdb_engine import DuckDBEngine
+            return DuckDBEngine(self.db_path)
+        except Exception as e:
+            if required:
+                raise
+            # e.g. duckdb not installed, or its sqlite extension unavailable offline
+            print(f"DuckDB engine unavailable, using sqlite3: {e}")  # Debugging
+            return None
+
+    @property
+    def is_sqlite(self) -> bool:
+        """Whether the source is a SQLite file (whichever engine runs the queries)."""
+        return self.engine is None or self.engine.is_sqlite
+
+    def _open(self) -> sqlite3.Connection:
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        if self.rollups is not None and not getattr(self._local, "rollups_attached", False):
+            conn.execute(f"ATTACH DATABASE ? AS {ROLLUP_SCHEMA}",
+                         (f"file:{os.path.abspath(self.rollups.cache_path)}?mode=ro",))
+            self._local.rollups_attached = True
+        return conn
+
+    def enable_rollups(self, cache_path: str = None):
+        """
+        Keep rollups of recurring GROUP BY queries in a sidecar database,
+        attached read-only to every connection; see RollupStore.
+        """
+        if self.engine is not None:
+            raise ValueError("Rollups are only available with the sqlite engine")
+        if self.rollups is None:
+            self.rollups = RollupStore(self.db_path, cache_path)
+
+    def current_connection(self):
+        """This thread's connection (or DuckDB cursor), e.g. to interrupt() a query from another thread."""
+        if self.engine is not None:
+            return self.engine.cursor()
+        return self._connection()
+
+    def data_version(self):
+        """
+        PRAGMA data_version read on the sentinel connection; changes whenever
+        another connection commits to the database. Non-SQLite sources use
+        the engine's file stamps instead.
+        """
+        if not self.is_sqlite:
+            return self.engine.data_version()
+        with self._sentinel_lock:
+            if self._sentinel is None:
+                self._sentinel = self._open()
+            return self._sentinel.execute("PRAGMA data_version;").fetchone()[0]
+
+    def close(self):
+        """Close every connection the server has opened."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        with self._sentinel_lock:
+            if self._sentinel is not None:
+                connections.append(self._sentinel)
+                self._sentinel = None
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+        if self.rollups is not None:
+            self.rollups.close()
+            self.rollups = None
+        if self.engine is not None:
+            self.engine.close()
+
+    def _schema_version(self, cursor) -> int:
+        cursor.execute("PRAGMA schema_version;")
+        return cursor.fetchone()[0]
+
+    def _introspect(self, cursor) -> dict:
+        """Read tables, columns, foreign keys and sample values."""
+        snapshot = {}
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
+        tables = [row[0] for row in cursor.fetchall()]
+
+        for table in tables:
+            cursor.execute(f"PRAGMA table_info({_quote(table)});")
+            columns = [
+                {
+                    "column_name": row[1],
+                    "data_type": row[2],
+                    "is_nullable": "YES" if row[3] == 0 else "NO",
+                    "default_value": row[4],
+                    "primary_key": row[5]
+                }
+                for row in cursor.fetchall()
+            ]
+            cursor.execute(f"PRAGMA foreign_key_list({_quote(table)});")
+            foreign_keys = [{"from": row[3], "table": row[2], "to": row[4]} for row in cursor.fetchall()]
+
+            samples = {}
+            if SCHEMA_SAMPLE_VALUES > 0:
+                for col in columns:
+                    # Only text-like columns: numeric samples rarely help the model write SQL
+                    if col["primary_key"] or "INT" in col["data_type"].upper() or "REAL" in col["data_type"].upper():
+                        continue
+                    name = _quote(col["column_name"])
+                    cursor.execute(
+                        f"SELECT DISTINCT {name} FROM (SELECT {name} FROM {_quote(table)} LIMIT ?) "
+                        f"WHERE {name} IS NOT NULL LIMIT ?;",
+                        (SCHEMA_SAMPLE_SCAN, SCHEMA_SAMPLE_VALUES),
+                    )
+                    values = [row[0] for row in cursor.fetchall()]
+                    if values:
+                        samples[col["column_name"]] = values
+
+            snapshot[table] = {"columns": columns, "foreign_keys": foreign_keys, "samples": samples}
+        return snapshot
+
+    def get_schema_snapshot(self) -> dict:
+        """
+        Return the cached schema snapshot, re-reading it only when
+        PRAGMA schema_version shows the schema has changed.
+        """
+        return self._cached_schema()[1]
+
+    def _cached_schema(self):
+        key = os.path.realpath(self.db_path)
+        if not self.is_sqlite:
+            version = self.engine.schema_version()
+            with _schema_lock:
+                cached = _schema_cache.get(key)
+                if cached and cached[0] == version:
+                    return cached
+            entry = (version, self.engine.introspect(SCHEMA_SAMPLE_VALUES, SCHEMA_SAMPLE_SCAN), {})
+            with _schema_lock:
+                _schema_cache[key] = entry
+            return entry
+        cursor = self._connection().cursor()
+        try:
+            version = self._schema_version(cursor)
+            with _schema_lock:
+                cached = _schema_cache.get(key)
+                if cached and cached[0] == version:
+                    return cached
+            snapshot = self._introspect(cursor)
         finally:
-            conn.close()
-        return json.dumps(schema, indent=2)
+            cursor.close()
+        entry = (version, snapshot, {})
+        with _schema_lock:
+            _schema_cache[key] = entry
+        return entry
+
+    def _schema_index(self, version, snapshot: dict) -> SchemaIndex:
+        """The BM25 index for the current schema, rebuilt when the schema changes."""
+        key = os.path.realpath(self.db_path)
+        with _schema_lock:
+            cached = _schema_indexes.get(key)
+            if cached and cached[0] == version:
+                return cached[1]
+        index = SchemaIndex(snapshot)
+        with _schema_lock:
+            _schema_indexes[key] = (version, index)
+        return index
 
-    def _execute_query(self, query: str) -> list[dict]:
-        """Execute a SELECT query and return results."""
+    def _get_schema(self, fmt: str = "compact", question: str = None, top_k: int = None) -> str:
+        """
+        Retrieve database schema, either as compact one-line-per-table text
+        ("compact", "compact_nosamples") or as the original JSON ("json").
+        Given a question, only the tables relevant to it are included
+        (see SchemaIndex.prune).
+        """
+        version, snapshot, rendered = self._cached_schema()
+        if question:
+            index = self._schema_index(version, snapshot)
+            snapshot, rendered = index.prune(question, SCHEMA_TOP_K if top_k is None else top_k)
+        text = rendered.get(fmt)
+        if text is None:
+            if fmt == "json":
+                text = json.dumps({table: info["columns"] for table, info in snapshot.items()})
+            elif fmt in ("compact", "compact_nosamples"):
+                text = render_compact_schema(snapshot, samples=fmt == "compact")
+            else:
+                raise ValueError(f"Unknown schema format: {fmt}")
+            rendered[fmt] = text
+        return text
+
+    def _execute_query(self, query: str, timeout: float = None, max_rows: int = None,
+                       max_bytes: int = None) -> QueryResult:
+        """
+        Execute a SELECT query and return results, within a wall-time,
+        row-count and result-size budget. Hitting a budget stops the query
+        and returns the rows read so far with QueryResult.truncated set.
+        """
         if not query.strip().upper().startswith("SELECT"):
             raise ValueError("Only SELECT queries are allowed")
-        
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        timeout = QUERY_TIMEOUT if timeout is None else timeout
+        max_rows = QUERY_MAX_ROWS if max_rows is None else max_rows
+        max_bytes = QUERY_MAX_BYTES if max_bytes is None else max_bytes
+        if self.engine is not None:
+            return self.engine.execute(query, timeout, max_rows, max_bytes)
+
+        conn = self._connection()
+        deadline = time.monotonic() + timeout
+        # A non-zero return from the progress handler aborts the running statement
+        conn.set_progress_handler(lambda: int(time.monotonic() > deadline), PROGRESS_STEPS)
         cursor = conn.cursor()
+        rows, size, truncated = [], 0, None
         try:
             cursor.execute(query)
-            results = [dict(row) for row in cursor.fetchall()]
-            return results
+            columns = [desc[0] for desc in cursor.description or ()]
+            while truncated is None:
+                batch = cursor.fetchmany(FETCH_BATCH)
+                if not batch:
+                    break
+                for row in batch:
+                    if len(rows) >= max_rows:
+                        truncated = "max_rows"
+                        break
+                    size += _row_bytes(row)
+                    if size > max_bytes:
+                        truncated = "max_bytes"
+                        break
+                    rows.append(row)
+        except sqlite3.OperationalError as e:
+            if time.monotonic() <= deadline:
+                raise ValueError(f"Error executing query: {str(e)}")
+            if cursor.description is None:
+                raise ValueError(f"Query exceeded the {timeout:g}s time budget")
+            columns = [desc[0] for desc in cursor.description]
+            truncated = "timeout"
         except Exception as e:
             raise ValueError(f"Error executing query: {str(e)}")
         finally:
-            conn.close()
+            cursor.close()
+            conn.set_progress_handler(None, 0)
+        return QueryResult.from_rows(columns, rows, truncated)
+
+    def run_query(self, query: str, timeout: float = None, max_rows: int = None,
+                  max_bytes: int = None, use_rollups: bool = False) -> QueryResult:
+        """
+        In-process equivalent of the read_query tool; raises ValueError on failure.
+        With use_rollups, recurring GROUP BY queries are answered from rollups;
+        building or refreshing one shares the query's time budget, and the
+        query runs on the source instead when that budget is hit.
+        """
+        if use_rollups and self.rollups is not None:
+            try:
+                query = self.rollups.rewrite(query, QUERY_TIMEOUT if timeout is None else timeout) or query
+            except sqlite3.Error as e:
+                print(f"Rollup rewrite skipped: {e}")  # Debugging
+        return self._execute_query(query, timeout, max_rows, max_bytes)
 
     def handle_tool(self, tool_name: str, arguments: dict = None) -> str:
         """Handle tool calls from the agent."""
         try:
             if tool_name == "get_schema":
-                return self._get_schema()
+                arguments = arguments or {}
+                return self._get_schema(
+                    arguments.get("format", "compact"), arguments.get("question"), arguments.get("top_k")
+                )
             elif tool_name == "read_query" and arguments:
                 query = arguments.get("query")
                 if not query:
                     raise ValueError("Query argument is required")
-                return json.dumps(self._execute_query(query))
+                result = self._execute_query(
+                    query, arguments.get("timeout"), arguments.get("max_rows"), arguments.get("max_bytes")
+                )
+                if result.truncated:
+                    return json.dumps({"results": result.to_records(), "truncated": result.truncated})
+                return json.dumps(result.to_records())
             else:
                 raise ValueError(f"Unknown tool: {tool_name}")
         except Exception as e:
-            return json.dumps({"error": str(e)})
\ No newline at end of file
+            return json.dumps({"error": str(e)})
+
+
+def get_server(db_path: str) -> SqlReadOnlyServer:
+    """Return the process-wide server for a database file (or Parquet/CSV source)."""
+    key = os.path.realpath(db_path)
+    with _servers_lock:
+        server = _servers.get(key)
+        if server is None:
+            server = _servers[key] = SqlReadOnlyServer(db_path)
+            if ROLLUPS_ENABLED and server.engine is None:
+                try:
+                    server.enable_rollups()
+                except sqlite3.Error as e:
+                    # e.g. the database directory is not writable for the sidecar
+                    print(f"Rollups disabled: {e}")  # Debugging
+        return server